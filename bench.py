@@ -0,0 +1,436 @@
+"""Banc de charge hors ligne pour le bot de giveaway.
+
+Fait tourner GiveawayView / GiveawayCog contre une fausse passerelle et une
+fausse API REST (latence, seaux de rate limit et réponses 429 configurables),
+sans serveur Discord ni token.
+
+Exemples :
+    python bench.py clicks --clicks 50000 --duration 60
+    python bench.py endings --giveaways 500 --spread 60
+    python bench.py reroll --channels 300
+    python bench.py all --output bench_output.txt
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import resource
+import sys
+import tempfile
+from collections import Counter, deque
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+# La base et le journal du bench sont jetables : ils doivent être configurés avant l'import du bot
+_workdir = tempfile.mkdtemp(prefix="giveaway-bench-")
+os.environ.setdefault('DB_PATH', os.path.join(_workdir, "bench.db"))
+os.environ.setdefault('AUDIT_DIR', os.path.join(_workdir, "audit"))
+
+import discord
+
+import main
+from main import FRANCE_TZ
+from giveaway_cog import GiveawayCog
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    index = min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))
+    return values[index]
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss est en kilo-octets sous Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+class FakeAPI:
+    """Fausse API REST : latence simulée et seaux de rate limit par route"""
+
+    def __init__(self, latency: float, jitter: float, bucket_limit: int, bucket_window: float):
+        self.latency = latency
+        self.jitter = jitter
+        self.bucket_limit = bucket_limit
+        self.bucket_window = bucket_window
+        self.requests = Counter()  # route -> nombre de requêtes
+        self.rate_limited = Counter()  # route -> nombre de 429
+        self._buckets = {}  # seau -> heures des dernières requêtes
+
+    async def request(self, route: str, bucket: str = None, limited: bool = True):
+        loop = asyncio.get_running_loop()
+        self.requests[route] += 1
+
+        if limited:
+            recent = self._buckets.setdefault(bucket or route, deque())
+            while True:
+                now = loop.time()
+                while recent and now - recent[0] >= self.bucket_window:
+                    recent.popleft()
+                if len(recent) < self.bucket_limit:
+                    recent.append(now)
+                    break
+                # 429 : on attend retry_after puis on réessaie, comme la bibliothèque
+                self.rate_limited[route] += 1
+                await asyncio.sleep(recent[0] + self.bucket_window - now)
+
+        await asyncio.sleep(max(0.0, self.latency + random.uniform(-self.jitter, self.jitter)))
+
+    def report(self):
+        lines = []
+        for route, count in sorted(self.requests.items()):
+            lines.append(f"    {route:<40} {count:>7} requêtes  {self.rate_limited[route]:>6} x 429")
+        return lines
+
+
+class FakeHTTPResponse:
+    def __init__(self, status: int, reason: str):
+        self.status = status
+        self.reason = reason
+
+
+class FakeMember:
+    def __init__(self, user_id: int, guild, admin: bool = False):
+        self.id = user_id
+        self.bot = False
+        self.guild = guild
+        self.mention = f"<@{user_id}>"
+        self.activities = []
+        self.voice = None
+        self.guild_permissions = SimpleNamespace(administrator=admin)
+
+
+class FakeMessage:
+    def __init__(self, api: FakeAPI, message_id: int, channel, embeds=None):
+        self.api = api
+        self.id = message_id
+        self.channel = channel
+        self.guild = channel.guild
+        self.embeds = embeds or []
+
+    async def edit(self, embed=None, view=discord.utils.MISSING, **kwargs):
+        await self.api.request("PATCH /channels/messages", bucket=f"edit:{self.channel.id}")
+        if embed is not None:
+            self.embeds = [embed]
+        return self
+
+    async def reply(self, content=None, **kwargs):
+        return await self.channel.send(content, reference=self, **kwargs)
+
+    async def delete(self, delay: float = None):
+        if delay:
+            await asyncio.sleep(delay)
+        await self.api.request("DELETE /channels/messages", bucket=f"delete:{self.channel.id}")
+
+
+class FakeTextChannel:
+    def __init__(self, api: FakeAPI, channel_id: int, guild):
+        self.api = api
+        self.id = channel_id
+        self.guild = guild
+        self.mention = f"<#{channel_id}>"
+        self.messages = {}
+
+    async def send(self, content=None, *, embed=None, view=None, reference=None, delete_after=None, **kwargs):
+        await self.api.request("POST /channels/messages", bucket=f"send:{self.id}")
+        message = FakeMessage(self.api, self.guild.next_id(), self, [embed] if embed else [])
+        self.messages[message.id] = message
+        if delete_after:
+            asyncio.create_task(message.delete(delay=delete_after))
+        return message
+
+    async def fetch_message(self, message_id: int):
+        await self.api.request("GET /channels/messages", bucket=f"fetch:{self.id}")
+        if message_id not in self.messages:
+            raise discord.NotFound(FakeHTTPResponse(404, "Not Found"), "Unknown Message")
+        return self.messages[message_id]
+
+    def get_partial_message(self, message_id: int):
+        return self.messages.get(message_id) or FakeMessage(self.api, message_id, self)
+
+    def permissions_for(self, member):
+        return SimpleNamespace(read_message_history=True)
+
+
+class FakeGuild:
+    def __init__(self, api: FakeAPI, guild_id: int, channel_count: int, member_count: int):
+        self.id = guild_id
+        self.shard_id = 0
+        self._next_id = guild_id
+        self.me = FakeMember(self.next_id(), self)
+        self.members = {}
+        for _ in range(member_count):
+            member = FakeMember(self.next_id(), self)
+            self.members[member.id] = member
+        self.text_channels = [FakeTextChannel(api, self.next_id(), self) for _ in range(channel_count)]
+        self.channels = list(self.text_channels)
+        self._channels = {channel.id: channel for channel in self.text_channels}
+
+    def next_id(self) -> int:
+        self._next_id += 1
+        return self._next_id
+
+    def get_member(self, user_id: int):
+        return self.members.get(user_id)
+
+    def get_channel(self, channel_id: int):
+        return self._channels.get(channel_id)
+
+
+class FakeInteractionResponse:
+    def __init__(self, interaction):
+        self.interaction = interaction
+        self._done = False
+
+    def is_done(self) -> bool:
+        return self._done
+
+    async def _ack(self):
+        await self.interaction.api.request("POST /interactions/callback", limited=False)
+        self._done = True
+        self.interaction.harness.ack_latencies.append(asyncio.get_running_loop().time() - self.interaction.created)
+
+    async def send_message(self, content=None, **kwargs):
+        await self._ack()
+
+    async def defer(self, **kwargs):
+        await self._ack()
+
+
+class FakeFollowup:
+    def __init__(self, api: FakeAPI):
+        self.api = api
+
+    async def send(self, content=None, **kwargs):
+        await self.api.request("POST /webhooks", limited=False)
+
+
+class FakeInteraction:
+    def __init__(self, harness, user: FakeMember):
+        self.harness = harness
+        self.api = harness.api
+        self.id = harness.guild.next_id()
+        self.user = user
+        self.guild = harness.guild
+        self.client = harness.bot
+        self.created = asyncio.get_running_loop().time()
+        self.created_at = discord.utils.utcnow()
+        self.response = FakeInteractionResponse(self)
+        self.followup = FakeFollowup(harness.api)
+
+
+class ReadyShim:
+    """Expose à GiveawayScheduler.run les deux méthodes du client qu'il utilise"""
+
+    def __init__(self):
+        self.closed = False
+
+    async def wait_until_ready(self):
+        return
+
+    def is_closed(self) -> bool:
+        return self.closed
+
+
+class Harness:
+    def __init__(self, args, channel_count: int = 1):
+        self.args = args
+        self.api = FakeAPI(args.latency, args.jitter, args.bucket_limit, args.bucket_window)
+        self.guild = FakeGuild(self.api, 1_000_000, channel_count, args.members)
+        self.host = FakeMember(self.guild.next_id(), self.guild, admin=True)
+        self.guild.members[self.host.id] = self.host
+        self.ack_latencies = []
+
+        self.bot = main.bot
+        self.bot.active_giveaways.clear()
+        self.bot.guild_states.clear()
+        # La fausse passerelle remplace le cache de la bibliothèque
+        self.bot.get_channel = self.guild.get_channel
+        self.bot.get_user = self.guild.get_member
+        self.bot.get_guild = lambda guild_id: self.guild if guild_id == self.guild.id else None
+        self.cog = GiveawayCog(self.bot)
+
+    async def create_giveaway(self, channel, duration: str, winners: int, conditional: bool = False):
+        interaction = FakeInteraction(self, self.host)
+        existing = set(self.bot.active_giveaways)
+        if conditional:
+            gain = app_choice("Nitro boost", "nitro")
+            nombre = app_choice(str(winners), winners)
+            await self.cog.pgiveaway.callback(self.cog, interaction, gain, nombre, duration, channel)
+        else:
+            await self.cog.giveaway.callback(self.cog, interaction, "Nitro", duration, channel, winners)
+        (message_id,) = set(self.bot.active_giveaways) - existing
+        return message_id
+
+
+def app_choice(name, value):
+    return discord.app_commands.Choice(name=name, value=value)
+
+
+async def scenario_clicks(args, out):
+    """N clics sur le bouton d'un même giveaway, répartis uniformément sur la durée"""
+    harness = Harness(args)
+    channel = harness.guild.text_channels[0]
+    message_id = await harness.create_giveaway(channel, "1j", 1, conditional=args.conditional)
+    view = harness.bot.active_giveaways[message_id]["view"]
+    members = list(harness.guild.members.values())
+    harness.ack_latencies.clear()
+    edits_before = harness.api.requests["PATCH /channels/messages"]
+
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    tasks = []
+    for i in range(args.clicks):
+        # Arrivées cadencées : on rattrape le retard par paquets plutôt que de dormir à chaque clic
+        due = start + i * args.duration / args.clicks
+        if due > loop.time():
+            await asyncio.sleep(due - loop.time())
+        interaction = FakeInteraction(harness, random.choice(members))
+        tasks.append(asyncio.create_task(view.participate_button(interaction)))
+        if args.events and i % max(1, args.clicks // args.events) == 0:
+            member = random.choice(members)
+            before = SimpleNamespace(channel=None, self_mute=False, mute=False)
+            member.voice = SimpleNamespace(channel=SimpleNamespace(members=[member]), self_mute=False, mute=False)
+            await harness.cog.on_voice_state_update(member, before, member.voice)
+            await harness.cog.on_presence_update(member, member)
+    await asyncio.gather(*tasks)
+    await view.flush_footer()
+    elapsed = loop.time() - start
+
+    out(f"== clicks : {args.clicks} clics en {args.duration:.0f} s ({len(view.participants)} participants finaux)")
+    out(f"  durée réelle         : {elapsed:.2f} s")
+    out(f"  ack p50 / p99        : {percentile(harness.ack_latencies, 50) * 1000:.1f} ms / {percentile(harness.ack_latencies, 99) * 1000:.1f} ms")
+    out(f"  éditions du footer   : {harness.api.requests['PATCH /channels/messages'] - edits_before}")
+    await harness.bot.store.flush()
+    return harness
+
+
+async def scenario_endings(args, out):
+    """M giveaways qui se terminent dans la même fenêtre de temps"""
+    harness = Harness(args, channel_count=args.giveaway_channels)
+    members = list(harness.guild.members.values())
+    created = []
+    for i in range(args.giveaways):
+        channel = harness.guild.text_channels[i % len(harness.guild.text_channels)]
+        duration = f"{args.lead + int(random.uniform(0, args.spread))}s"
+        message_id = await harness.create_giveaway(channel, duration, args.winners, conditional=args.conditional)
+        view = harness.bot.active_giveaways[message_id]["view"]
+        for member in random.sample(members, min(args.participants, len(members))):
+            view.participants.add(member.id)
+        created.append(message_id)
+
+    end_times = {message_id: harness.bot.active_giveaways[message_id]["end_time"] for message_id in created}
+    start_lateness = []
+    end_lateness = []
+    end_giveaway = harness.cog.scheduler.callback
+
+    async def timed_end(message_id):
+        start_lateness.append((datetime.now(FRANCE_TZ) - end_times[message_id]).total_seconds())
+        await end_giveaway(message_id)
+        end_lateness.append((datetime.now(FRANCE_TZ) - end_times[message_id]).total_seconds())
+
+    harness.cog.scheduler.callback = timed_end
+    shim = ReadyShim()
+    scheduler_task = asyncio.create_task(harness.cog.scheduler.run(shim))
+
+    deadline = max(end_times.values()) + timedelta(seconds=args.timeout)
+    while harness.bot.active_giveaways and datetime.now(FRANCE_TZ) < deadline:
+        await asyncio.sleep(0.1)
+    await harness.bot.outbound.drain()
+    shim.closed = True
+    scheduler_task.cancel()
+
+    out(f"== endings : {args.giveaways} giveaways sur {args.spread:.0f} s, {args.participants} participants chacun")
+    out(f"  terminés             : {len(end_lateness)} / {args.giveaways}")
+    out(f"  retard début p50/p99 : {percentile(start_lateness, 50):.2f} s / {percentile(start_lateness, 99):.2f} s")
+    out(f"  retard fin p50/p99   : {percentile(end_lateness, 50):.2f} s / {percentile(end_lateness, 99):.2f} s")
+    return harness
+
+
+async def scenario_reroll(args, out):
+    """Reroll dans un serveur de N salons : le tirage part du résultat enregistré, sans lecture de l'API"""
+    harness = Harness(args, channel_count=args.channels)
+    loop = asyncio.get_running_loop()
+    channel = harness.guild.text_channels[-1]
+    message_id = await harness.create_giveaway(channel, "1j", 1)
+    view = harness.bot.active_giveaways[message_id]["view"]
+    view.participants.update(list(harness.guild.members)[:args.participants])
+    await harness.cog.end_giveaway(message_id)
+    await harness.bot.outbound.drain()
+
+    harness.ack_latencies.clear()
+    fetches_before = harness.api.requests["GET /channels/messages"]
+    start = loop.time()
+    await harness.cog.reroll.callback(harness.cog, FakeInteraction(harness, harness.host), str(message_id))
+    await harness.bot.outbound.drain()
+    fetches = harness.api.requests["GET /channels/messages"] - fetches_before
+    out(f"== reroll : {args.channels} salons")
+    out(f"  /reroll complet      : {(loop.time() - start) * 1000:.0f} ms, {fetches} lecture(s)")
+    return harness
+
+
+SCENARIOS = {
+    "clicks": scenario_clicks,
+    "endings": scenario_endings,
+    "reroll": scenario_reroll,
+}
+
+
+async def run(args):
+    lines = []
+
+    def out(line=""):
+        print(line)
+        lines.append(line)
+
+    names = list(SCENARIOS) if args.scenario == "all" else [args.scenario]
+    for name in names:
+        harness = await SCENARIOS[name](args, out)
+        out("  requêtes HTTP :")
+        for line in harness.api.report():
+            out(line)
+        out(f"  RSS max              : {peak_rss_mb():.1f} Mo")
+        out()
+
+    await main.bot.store.close()
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            file.write("\n".join(lines) + "\n")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Banc de charge hors ligne du bot de giveaway")
+    parser.add_argument("scenario", choices=[*SCENARIOS, "all"])
+    parser.add_argument("--output", help="écrit aussi le rapport dans ce fichier")
+    parser.add_argument("--seed", type=int, default=0)
+
+    api = parser.add_argument_group("fausse API")
+    api.add_argument("--latency", type=float, default=0.08, help="latence moyenne d'une requête (s)")
+    api.add_argument("--jitter", type=float, default=0.03)
+    api.add_argument("--bucket-limit", type=int, default=5, help="requêtes par seau avant 429")
+    api.add_argument("--bucket-window", type=float, default=5.0, help="fenêtre d'un seau (s)")
+
+    load = parser.add_argument_group("charge")
+    load.add_argument("--members", type=int, default=20000, help="membres du faux serveur")
+    load.add_argument("--clicks", type=int, default=50000)
+    load.add_argument("--duration", type=float, default=60.0, help="durée d'arrivée des clics (s)")
+    load.add_argument("--events", type=int, default=0, help="événements vocal/statut pendant les clics")
+    load.add_argument("--conditional", action="store_true", help="utilise /pgiveaway au lieu de /giveaway")
+    load.add_argument("--giveaways", type=int, default=500)
+    load.add_argument("--giveaway-channels", type=int, default=50)
+    load.add_argument("--participants", type=int, default=200)
+    load.add_argument("--winners", type=int, default=3)
+    load.add_argument("--lead", type=int, default=5, help="délai avant la première fin (s)")
+    load.add_argument("--spread", type=float, default=60.0, help="fenêtre des fins de giveaways (s)")
+    load.add_argument("--timeout", type=float, default=120.0)
+    load.add_argument("--channels", type=int, default=300)
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    arguments = parse_args()
+    random.seed(arguments.seed)
+    asyncio.run(run(arguments))
+    sys.exit(0)
@@ -0,0 +1,1400 @@
+import os
+import discord
+from discord.ext import commands
+from discord import app_commands
+import asyncio
+import csv
+import json
+import re
+import secrets
+import tempfile
+import tracemalloc
+from array import array
+from collections import Counter, OrderedDict
+from datetime import datetime, timedelta
+
+# /recharger ne recharge que ce fichier : tout ce qui vient de main (planificateur, base, suivi des
+# conditions, file d'envoi, fonctions utilitaires) garde le code chargé au démarrage du bot
+from main import (
+    BATCH_SPREAD, CLICK_BURST, CLICK_RATE, DRAW_FROM_ELIGIBLE, END_CONCURRENCY, END_MAX_RETRIES, END_RETRY_DELAY, FOOTER_UPDATE_INTERVAL,
+    FRANCE_TZ, GIVEAWAY_LIST_PAGE_SIZE, GIVEAWAY_LIST_RECENT, LOW_MEMORY, MAX_PARTICIPANTS_PER_GIVEAWAY,
+    MEMORY_HARD_LIMIT_MB, MEMORY_SOFT_LIMIT_MB, REPORT_DISQUALIFIED,
+    GiveawayLimitError, GiveawayScheduler, ParticipantSet, clock,
+    build_conditions_message, has_akusa_status, parse_duration, parse_start
+)
+
+class GiveawayView(discord.ui.View):
+    """View pour le bouton de participation"""
+    
+    def __init__(self, emoji: str, end_time: datetime, winners: int, prize: str, channel_id: int, message_id: int = None, conditions_type: str = None, custom_id: str = None):
+        super().__init__(timeout=None)
+        self.emoji = emoji
+        self.end_time = end_time
+        self.winners = winners
+        self.prize = prize
+        self.channel_id = channel_id
+        self.message_id = message_id
+        self.conditions_type = conditions_type  # "nitro" ou "deco" ou None
+        self.participants = ParticipantSet()
+        self.message = None
+        self._footer_task = None
+        self._footer_count = 0  # Nombre de participants actuellement affiché
+        self._footer_last_edit = 0.0
+        self._click_buckets = OrderedDict()  # user_id -> (jetons restants, heure de la dernière recharge), du plus ancien au plus récent
+
+        # ✅ Ajout du bouton avec l'emoji
+        button = discord.ui.Button(
+            style=discord.ButtonStyle.gray,
+            label="participer",
+            emoji=self.emoji,
+            custom_id=custom_id or (f"giveaway_{message_id}" if message_id else None)
+        )
+        button.callback = self.participate_button
+        self.add_item(button)
+
+    def _allow_click(self, user_id: int) -> bool:
+        """Seau à jetons par utilisateur pour ce giveaway"""
+        now = clock.monotonic()
+        buckets = self._click_buckets
+        tokens, last = buckets.pop(user_id, (CLICK_BURST, now))
+        tokens = min(CLICK_BURST, tokens + (now - last) * CLICK_RATE)
+        allowed = tokens >= 1
+        # Réinsertion en fin : les seaux restent triés par heure de dernière recharge
+        buckets[user_id] = (tokens - 1 if allowed else tokens, now)
+
+        # Les seaux redevenus pleins sont oubliés, quelques-uns à chaque clic (coût constant)
+        refill = CLICK_BURST / CLICK_RATE if CLICK_RATE else float("inf")
+        for _ in range(4):
+            oldest, (_, updated) = next(iter(buckets.items()))
+            if now - updated < refill:
+                break
+            buckets.popitem(last=False)
+        return allowed
+
+    async def participate_button(self, interaction: discord.Interaction):
+        """Bouton de participation - toggle participation"""
+        
+        # Clic limité : simple accusé de réception, sans message ni changement d'état
+        if not self._allow_click(interaction.user.id):
+            interaction.client.metrics.inc("button_throttled")
+            await interaction.response.defer()
+            return
+        
+        if interaction.user.bot:
+            await interaction.response.send_message("Les bots ne peuvent pas participer !", ephemeral=True)
+            return
+
+        if interaction.client.shutting_down:
+            await interaction.response.send_message("Le bot redémarre, réessayez dans quelques instants", ephemeral=True)
+            return
+
+        user_id = interaction.user.id
+        
+        store = interaction.client.store
+        
+        if user_id in self.participants:
+            self.participants.remove(user_id)
+            store.toggle_participant(self.message_id, user_id, False)
+            interaction.client.participants_data.remove_participant(self.message_id, user_id)
+            await interaction.response.send_message("Vous ne participez plus au giveaway", ephemeral=True)
+        elif MAX_PARTICIPANTS_PER_GIVEAWAY and len(self.participants) >= MAX_PARTICIPANTS_PER_GIVEAWAY:
+            await interaction.response.send_message("Ce giveaway a atteint son nombre maximum de participants", ephemeral=True)
+            return
+        else:
+            self.participants.add(user_id)
+            store.toggle_participant(self.message_id, user_id, True)
+            # interaction.user est reconstruit depuis l'interaction, sans présence : on part du membre en cache
+            member = interaction.guild.get_member(user_id)
+            interaction.client.participants_data.add_participant(self.message_id, user_id, member)
+            if member is None and self.conditions_type:
+                # Chargé avec sa présence puis réévalué ; il reçoit ensuite ses changements de statut
+                interaction.client.request_member(interaction.guild, user_id)
+            await interaction.response.send_message("Votre participation est bien enregistrée", ephemeral=True)
+        interaction.client.metrics.observe_ack(interaction, "button:participer")
+
+        # La mise à jour du footer est regroupée en arrière-plan pour ne pas bloquer la réponse
+        self.schedule_footer_update()
+
+    def footer_text(self) -> str:
+        # 🇫🇷 Heure France (UTC+1)
+        france_time = self.end_time.astimezone(FRANCE_TZ)
+        return f"Participants: {len(self.participants)} • Fin: {france_time.strftime('%d/%m/%Y %H:%M:%S')}"
+
+    def schedule_footer_update(self):
+        """Planifie une édition du footer : au plus une édition par FOOTER_UPDATE_INTERVAL"""
+        if self._footer_task is None or self._footer_task.done():
+            self._footer_task = asyncio.create_task(self._footer_updater())
+
+    async def _footer_updater(self):
+        loop = asyncio.get_running_loop()
+        # Tant que le compte affiché n'est pas le bon, on attend la fin de l'intervalle puis on édite
+        while self.message and self._footer_count != len(self.participants):
+            delay = self._footer_last_edit + FOOTER_UPDATE_INTERVAL - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            await self._edit_footer()
+            self._footer_last_edit = loop.time()
+
+    async def _edit_footer(self):
+        if not self.message:
+            return
+
+        count = len(self.participants)
+        try:
+            # discord.Message hérite de PartialMessage : seul un message partiel doit être récupéré
+            if type(self.message) is discord.PartialMessage:
+                self.message = await self.message.fetch()
+
+            embed = self.message.embeds[0]
+            embed.set_footer(text=self.footer_text())
+            await self.message.edit(embed=embed)
+            self._footer_count = count
+        except (discord.NotFound, discord.Forbidden) as e:
+            # Message supprimé ou inaccessible : inutile de réessayer à chaque intervalle
+            print(f"Mise à jour footer abandonnée: {e}")
+            self.message = None
+        except discord.HTTPException as e:
+            print(f"Erreur mise à jour footer: {e}")
+
+    def cancel_footer_update(self):
+        """Annule l'édition en attente (l'embed va être remplacé)"""
+        if self._footer_task and not self._footer_task.done():
+            self._footer_task.cancel()
+
+    async def flush_footer(self):
+        """Annule l'édition en attente et publie immédiatement le compte final"""
+        self.cancel_footer_update()
+        if self._footer_count != len(self.participants):
+            await self._edit_footer()
+
+
+class GiveawayListView(discord.ui.View):
+    """Pagination de /giveaways : les pages sont calculées une fois, les boutons ne font que changer de page"""
+
+    def __init__(self, pages, author_id: int):
+        super().__init__(timeout=180)
+        self.pages = pages  # Embeds déjà construits
+        self.author_id = author_id
+        self.index = 0
+        self.message = None
+        self._update_buttons()
+
+    def _update_buttons(self):
+        self.previous_page.disabled = self.index == 0
+        self.next_page.disabled = self.index >= len(self.pages) - 1
+
+    async def interaction_check(self, interaction: discord.Interaction) -> bool:
+        if interaction.user.id != self.author_id:
+            await interaction.response.send_message("Seul l'auteur de la commande peut changer de page", ephemeral=True)
+            return False
+        return True
+
+    async def _show(self, interaction: discord.Interaction, index: int):
+        self.index = index
+        self._update_buttons()
+        await interaction.response.edit_message(embed=self.pages[self.index], view=self)
+
+    @discord.ui.button(emoji="◀️", style=discord.ButtonStyle.gray)
+    async def previous_page(self, interaction: discord.Interaction, button: discord.ui.Button):
+        await self._show(interaction, max(self.index - 1, 0))
+
+    @discord.ui.button(emoji="▶️", style=discord.ButtonStyle.gray)
+    async def next_page(self, interaction: discord.Interaction, button: discord.ui.Button):
+        await self._show(interaction, min(self.index + 1, len(self.pages) - 1))
+
+    async def on_timeout(self):
+        if self.message:
+            try:
+                await self.message.edit(view=None)
+            except discord.HTTPException:
+                pass
+
+
+class GiveawayCog(commands.Cog):
+    def __init__(self, bot):
+        self.bot = bot
+        self.scheduler = GiveawayScheduler(self.end_giveaway, concurrency=END_CONCURRENCY)
+        self.ending = set()  # message_id des giveaways en cours de clôture
+        # Même planificateur pour les lancements différés, indexé par plan_id
+        self.start_scheduler = GiveawayScheduler(self.start_planned)
+        self.planned = {}  # plan_id -> giveaway planifié
+        self.resuming = set()  # message_id des clôtures interrompues (dernier arrêt ou échec) à reprendre
+        self.end_failures = {}  # message_id -> nombre de clôtures échouées d'affilée
+        self._scheduler_tasks = []
+
+    async def cog_load(self):
+        handoff = self.bot.cog_handoff
+        if handoff:
+            # Rechargement : on reprend les planificateurs de l'instance précédente tels quels
+            self.scheduler = handoff["scheduler"]
+            self.start_scheduler = handoff["start_scheduler"]
+            self.planned = handoff["planned"]
+            self.ending = handoff["ending"]
+            self.resuming = handoff["resuming"]
+            self.end_failures = handoff.get("end_failures", {})
+            self.scheduler.callback = self.end_giveaway
+            self.start_scheduler.callback = self.start_planned
+        else:
+            for message_id, data in self.bot.active_giveaways.items():
+                self.scheduler.schedule(message_id, data["end_time"], group=data["guild_id"])
+            resuming = json.loads(await self.bot.store.get_meta(self.bot.state_key("resume_endings")) or "[]")
+            self.resuming = {message_id for message_id in resuming if message_id in self.bot.active_giveaways}
+            if self.resuming:
+                await self.bot.store.set_meta(self.bot.state_key("resume_endings"), "[]")
+                print(f"♻️ {len(self.resuming)} clôture(s) interrompue(s) à reprendre")
+            for plan in await self.bot.store.load_planned():
+                if self.bot.owns_guild(plan["guild_id"]):
+                    self.planned[plan["plan_id"]] = plan
+                    self.start_scheduler.schedule(plan["plan_id"], plan["start_time"], group=plan["guild_id"])
+
+        for message_id, data in self.bot.active_giveaways.items():
+            if message_id not in self.ending:
+                self.attach_view(data)
+
+        self._scheduler_tasks = [
+            asyncio.create_task(self.scheduler.run(self.bot)),
+            asyncio.create_task(self.start_scheduler.run(self.bot))
+        ]
+        # Consommé seulement une fois le chargement réussi (sinon l'ancienne version le reprend)
+        self.bot.cog_handoff = None
+
+    async def cog_unload(self):
+        for task in self._scheduler_tasks:
+            task.cancel()
+        # Les clôtures déjà lancées continuent avec l'ancien code ; le reste passe à la nouvelle instance
+        self.bot.cog_handoff = {
+            "scheduler": self.scheduler,
+            "start_scheduler": self.start_scheduler,
+            "planned": self.planned,
+            "ending": self.ending,
+            "resuming": self.resuming,
+            "end_failures": self.end_failures
+        }
+
+    async def drain(self):
+        """Arrêt : plus de nouvelles échéances, attente des clôtures en cours et footers à jour"""
+        for task in self._scheduler_tasks:
+            task.cancel()
+        await self.scheduler.drain()
+        await self.start_scheduler.drain()
+        views = [data["view"] for data in self.bot.active_giveaways.values() if data.get("view")]
+        await asyncio.gather(*(view.flush_footer() for view in views), return_exceptions=True)
+
+    def attach_view(self, data: dict):
+        """(Re)crée la view d'un giveaway avec la classe actuelle, sous le même custom_id"""
+        message_id = data["message_id"]
+        view = GiveawayView(
+            data["emoji"], data["end_time"], data["winners"], data["prize"], data["channel_id"],
+            message_id=message_id, conditions_type=data["conditions_type"], custom_id=data["custom_id"]
+        )
+        view.participants = data["participants"]
+
+        previous = data.get("view")
+        if previous:
+            # L'ancienne view doit quitter le store avant l'enregistrement de la nouvelle
+            previous.stop()
+            if previous._footer_task and not previous._footer_task.done():
+                previous._footer_task.cancel()
+            view.message = previous.message
+            view._footer_count = previous._footer_count
+            view._footer_last_edit = previous._footer_last_edit
+            view._click_buckets = previous._click_buckets
+        else:
+            view._footer_count = len(view.participants)
+            # Message partiel : il sera récupéré à la première mise à jour du footer
+            view.message = self.bot.get_partial_messageable(data["channel_id"]).get_partial_message(message_id)
+
+        self.bot.add_view(view, message_id=message_id)
+        data["view"] = view
+        # Reprend une mise à jour du footer interrompue par le rechargement
+        view.schedule_footer_update()
+
+    async def start_giveaway(self, salon: discord.TextChannel, prize: str, temps: str, winners: int, emoji: str, host_id: int, conditions_type: str = None):
+        """Envoie un giveaway, l'enregistre et planifie sa fin (commun aux commandes et aux lancements planifiés)"""
+        duration = parse_duration(temps)
+        if duration is None:
+            raise ValueError(temps)
+        if self.bot.shutting_down:
+            raise GiveawayLimitError("Le bot redémarre, réessayez dans quelques instants.")
+        self.bot.check_giveaway_quota(salon.guild.id)
+
+        # 🇫🇷 Heure de fin en France (UTC+1)
+        end_time = clock.now() + duration
+
+        embed = discord.Embed(
+            title="**Giveaway**",
+            description=f"```\nGain : {prize}\n\nDurée : {temps}\n\nNombre de gagnants : {winners}\n\n```",
+            color=0xFFFFFF
+        )
+        
+        embed.add_field(name="\u200b", value="───────────────────", inline=False)
+        # 🇫🇷 Affichage heure France
+        embed.set_footer(text=f"Participants: 0 • Fin: {end_time.strftime('%d/%m/%Y %H:%M:%S')}")
+
+        view = GiveawayView(emoji, end_time, winners, prize, salon.id, conditions_type=conditions_type, custom_id=f"giveaway_{secrets.token_hex(8)}")
+        
+        # Envoi de l'embed principal
+        giveaway_message = await salon.send(embed=embed, view=view)
+        view.message = giveaway_message
+        view.message_id = giveaway_message.id
+
+        if conditions_type:
+            # Envoi du message de conditions
+            await salon.send(build_conditions_message(conditions_type, winners))
+        
+        data = {
+            "end_time": end_time,
+            "winners": winners,
+            "prize": prize,
+            "emoji": emoji,
+            "duration": temps,
+            "guild_id": salon.guild.id,
+            "channel_id": salon.id,
+            "message_id": giveaway_message.id,
+            "host_id": host_id,
+            "custom_id": view.children[0].custom_id,
+            "view": view,
+            "participants": view.participants,
+            "conditions_type": conditions_type,
+            "conditions_level": winners if conditions_type else None
+        }
+        self.bot.add_giveaway(data)
+        if conditions_type:
+            self.bot.participants_data.start_giveaway(giveaway_message.id, salon.guild.id, winners)
+        await self.bot.store.save_giveaway(data)
+        await self.bot.store.index_message(giveaway_message.id, salon.id, salon.guild.id)
+        self.scheduler.schedule(giveaway_message.id, end_time, group=salon.guild.id)
+        return giveaway_message
+
+    @app_commands.command(name="giveaway", description="Lance un giveaway")
+    async def giveaway(
+        self, 
+        interaction: discord.Interaction, 
+        gain: str,
+        temps: str,
+        salon: discord.TextChannel,
+        nombre_de_gagnants: app_commands.Range[int, 1, 25],
+        emoji: str = "🎉"
+    ):
+        """Commande slash pour créer un giveaway - Nombre de gagnants OBLIGATOIRE"""
+        
+        if not await self.bot.is_authorized(interaction.user):
+            embed_error = discord.Embed(
+                description="Vous n'êtes pas autorisé à utiliser cette commande.",
+                color=0xFF0000
+            )
+            await interaction.response.send_message(embed=embed_error, ephemeral=True)
+            return
+
+        await interaction.response.defer(ephemeral=True)
+        self.bot.metrics.observe_ack(interaction, "giveaway")
+
+        try:
+            await self.start_giveaway(salon, gain, temps, nombre_de_gagnants, emoji, interaction.user.id)
+
+            embed_confirm = discord.Embed(
+                description=f"Le giveaway **{gain}** est lancé dans le salon {salon.mention}",
+                color=0x00FF00
+            )
+            await interaction.followup.send(embed=embed_confirm, ephemeral=True)
+
+        except GiveawayLimitError as e:
+            embed_error = discord.Embed(
+                description=str(e),
+                color=0xFF0000
+            )
+            await interaction.followup.send(embed=embed_error, ephemeral=True)
+        except ValueError:
+            embed_error = discord.Embed(
+                description="Format de temps invalide. Exemple: `10s`, `5m`, `2h`, `1j`",
+                color=0xFF0000
+            )
+            await interaction.followup.send(embed=embed_error, ephemeral=True)
+        except Exception as e:
+            embed_error = discord.Embed(
+                description=f"Une erreur est survenue: {str(e)}",
+                color=0xFF0000
+            )
+            await interaction.followup.send(embed=embed_error, ephemeral=True)
+
+    @app_commands.command(name="pgiveaway", description="Lance un giveaway avec conditions prédéfinies")
+    @app_commands.choices(gain=[
+        app_commands.Choice(name="Nitro boost", value="nitro"),
+        app_commands.Choice(name="Décoration", value="deco")
+    ])
+    @app_commands.choices(nombre=[
+        app_commands.Choice(name="1", value=1),
+        app_commands.Choice(name="2", value=2),
+        app_commands.Choice(name="3", value=3),
+        app_commands.Choice(name="4", value=4),
+        app_commands.Choice(name="5", value=5),
+        app_commands.Choice(name="6", value=6),
+        app_commands.Choice(name="7", value=7),
+        app_commands.Choice(name="8", value=8),
+        app_commands.Choice(name="9", value=9),
+        app_commands.Choice(name="10", value=10),
+        app_commands.Choice(name="11", value=11),
+        app_commands.Choice(name="12", value=12),
+        app_commands.Choice(name="13", value=13),
+        app_commands.Choice(name="14", value=14),
+        app_commands.Choice(name="15", value=15),
+    ])
+    async def pgiveaway(
+        self, 
+        interaction: discord.Interaction, 
+        gain: app_commands.Choice[str],
+        nombre: app_commands.Choice[int],
+        temps: str,
+        salon: discord.TextChannel,
+        emoji: str = "🎉"
+    ):
+        """Commande slash pour créer un giveaway personnalisé avec conditions"""
+        
+        if not await self.bot.is_authorized(interaction.user):
+            embed_error = discord.Embed(
+                description="Vous n'êtes pas autorisé à utiliser cette commande.",
+                color=0xFF0000
+            )
+            await interaction.response.send_message(embed=embed_error, ephemeral=True)
+            return
+
+        await interaction.response.defer(ephemeral=True)
+        self.bot.metrics.observe_ack(interaction, "pgiveaway")
+
+        try:
+            gain_display = "Nitro boost" if gain.value == "nitro" else "Décoration"
+            await self.start_giveaway(salon, gain_display, temps, nombre.value, emoji, interaction.user.id, conditions_type=gain.value)
+
+            embed_confirm = discord.Embed(
+                description=f"Le giveaway **{gain_display}** est lancé dans le salon {salon.mention} avec conditions",
+                color=0x00FF00
+            )
+            await interaction.followup.send(embed=embed_confirm, ephemeral=True)
+
+        except GiveawayLimitError as e:
+            embed_error = discord.Embed(
+                description=str(e),
+                color=0xFF0000
+            )
+            await interaction.followup.send(embed=embed_error, ephemeral=True)
+        except ValueError:
+            embed_error = discord.Embed(
+                description="Format de temps invalide. Exemple: `10s`, `5m`, `2h`, `1j`",
+                color=0xFF0000
+            )
+            await interaction.followup.send(embed=embed_error, ephemeral=True)
+        except Exception as e:
+            embed_error = discord.Embed(
+                description=f"Une erreur est survenue: {str(e)}",
+                color=0xFF0000
+            )
+            await interaction.followup.send(embed=embed_error, ephemeral=True)
+
+    async def plan_giveaways(self, channels, prize: str, temps: str, winners: int, emoji: str, host_id: int, start_time: datetime):
+        """Enregistre des lancements futurs, décalés de BATCH_SPREAD secondes par salon"""
+        plans = []
+        for index, channel in enumerate(channels):
+            plans.append({
+                "guild_id": channel.guild.id,
+                "channel_id": channel.id,
+                "host_id": host_id,
+                "start_time": start_time + timedelta(seconds=index * BATCH_SPREAD),
+                "prize": prize,
+                "duration": temps,
+                "winners": winners,
+                "emoji": emoji
+            })
+        for plan in await self.bot.store.add_planned(plans):
+            self.planned[plan["plan_id"]] = plan
+            self.start_scheduler.schedule(plan["plan_id"], plan["start_time"], group=plan["guild_id"])
+        return plans
+
+    async def start_planned(self, plan_id: int):
+        plan = self.planned.pop(plan_id, None)
+        if not plan:
+            return
+        await self.bot.store.delete_planned(plan_id)
+
+        channel = self.bot.get_channel(plan["channel_id"])
+        if not channel:
+            reason = "salon introuvable"
+        else:
+            try:
+                await self.start_giveaway(channel, plan["prize"], plan["duration"], plan["winners"], plan["emoji"], plan["host_id"])
+                return
+            except GiveawayLimitError as e:
+                reason = str(e)
+            except discord.HTTPException as e:
+                reason = f"erreur Discord ({e.status})"
+
+        # Le plan est déjà supprimé : l'hôte est prévenu pour pouvoir le relancer
+        print(f"Giveaway planifié {plan_id} ignoré : {reason}")
+        await self.notify_host(
+            plan["host_id"],
+            f"Le giveaway planifié **{plan['prize']}** dans <#{plan['channel_id']}> n'a pas pu démarrer : {reason}"
+        )
+
+    async def notify_host(self, host_id: int, message: str):
+        """Prévient l'hôte en message privé (ignoré si ses MP sont fermés)"""
+        try:
+            user = self.bot.get_user(host_id) or await self.bot.fetch_user(host_id)
+            await user.send(embed=discord.Embed(description=message, color=0xFF0000))
+        except discord.HTTPException as e:
+            print(f"Impossible de prévenir l'hôte {host_id}: {e}")
+
+    @app_commands.command(name="giveaway_planifie", description="Planifie un giveaway qui démarrera plus tard")
+    async def giveaway_planifie(
+        self,
+        interaction: discord.Interaction,
+        gain: str,
+        debut: str,
+        temps: str,
+        salon: discord.TextChannel,
+        nombre_de_gagnants: app_commands.Range[int, 1, 25],
+        emoji: str = "🎉"
+    ):
+        """debut : délai (`30m`, `2h`...) ou date `JJ/MM/AAAA HH:MM` (heure France)"""
+        await self.plan_command(interaction, gain, debut, temps, [salon], nombre_de_gagnants, emoji)
+
+    @app_commands.command(name="giveaway_lot", description="Lance ou planifie le même giveaway dans plusieurs salons")
+    async def giveaway_lot(
+        self,
+        interaction: discord.Interaction,
+        gain: str,
+        temps: str,
+        salons: str,
+        nombre_de_gagnants: app_commands.Range[int, 1, 25],
+        debut: str = None,
+        emoji: str = "🎉"
+    ):
+        """salons : mentions ou ids des salons séparés par des espaces"""
+        channels = []
+        for channel_id in re.findall(r"\d{15,}", salons):
+            channel = interaction.guild.get_channel(int(channel_id))
+            if isinstance(channel, discord.TextChannel) and channel not in channels:
+                channels.append(channel)
+        await self.plan_command(interaction, gain, debut, temps, channels, nombre_de_gagnants, emoji)
+
+    async def plan_command(self, interaction: discord.Interaction, gain: str, debut: str, temps: str, channels, winners: int, emoji: str):
+        if not await self.bot.is_authorized(interaction.user):
+            embed_error = discord.Embed(
+                description="Vous n'êtes pas autorisé à utiliser cette commande.",
+                color=0xFF0000
+            )
+            await interaction.response.send_message(embed=embed_error, ephemeral=True)
+            return
+
+        await interaction.response.defer(ephemeral=True)
+        self.bot.metrics.observe_ack(interaction, "planification")
+
+        # Vérifications faites une seule fois pour tout le lot
+        start_time = parse_start(debut) if debut else clock.now()
+        try:
+            duration = parse_duration(temps)
+        except (ValueError, IndexError):
+            duration = None
+        if duration is None or start_time is None:
+            embed_error = discord.Embed(
+                description="Format invalide. Temps : `10s`, `5m`, `2h`, `1j` • Début : `2h` ou `JJ/MM/AAAA HH:MM` (dans le futur)",
+                color=0xFF0000
+            )
+            await interaction.followup.send(embed=embed_error, ephemeral=True)
+            return
+
+        if not channels:
+            embed_error = discord.Embed(
+                description="Aucun salon valide.",
+                color=0xFF0000
+            )
+            await interaction.followup.send(embed=embed_error, ephemeral=True)
+            return
+
+        plans = await self.plan_giveaways(channels, gain, temps, winners, emoji, interaction.user.id, start_time)
+
+        first = plans[0]["start_time"].strftime('%d/%m/%Y %H:%M:%S')
+        embed_confirm = discord.Embed(
+            description=f"{len(plans)} giveaway{'s' if len(plans) > 1 else ''} **{gain}** planifié{'s' if len(plans) > 1 else ''} à partir du {first}",
+            color=0x00FF00
+        )
+        await interaction.followup.send(embed=embed_confirm, ephemeral=True)
+
+    @app_commands.command(name="reroll", description="Choisit de nouveaux gagnants pour un giveaway")
+    async def reroll(self, interaction: discord.Interaction, id_du_message: str):
+        if not await self.bot.is_authorized(interaction.user):
+            embed_error = discord.Embed(
+                description="Vous n'êtes pas autorisé à utiliser cette commande.",
+                color=0xFF0000
+            )
+            await interaction.response.send_message(embed=embed_error, ephemeral=True)
+            return
+
+        await interaction.response.defer(ephemeral=True)
+        self.bot.metrics.observe_ack(interaction, "reroll")
+
+        try:
+            message_id = int(id_du_message)
+        except ValueError:
+            embed_error = discord.Embed(
+                description="Id du message invalide",
+                color=0xFF0000
+            )
+            await interaction.followup.send(embed=embed_error, ephemeral=True)
+            return
+
+        # Le tirage se fait sur le résultat enregistré : aucune lecture de l'API n'est nécessaire
+        if message_id in self.ending or message_id in self.bot.active_giveaways:
+            embed_error = discord.Embed(
+                description="Ce giveaway n'est pas encore terminé.",
+                color=0xFF0000
+            )
+            await interaction.followup.send(embed=embed_error, ephemeral=True)
+            return
+
+        result = await self.bot.store.load_result(message_id)
+        if result and result["guild_id"] not in (None, interaction.guild.id):
+            result = None  # Giveaway d'un autre serveur
+        channel = interaction.guild.get_channel(result["channel_id"]) if result else None
+
+        if not channel:
+            # Réponse tirée de l'index seul : aucune recherche dans les salons
+            if result:
+                description = "Le salon de ce giveaway est introuvable."
+            else:
+                indexed = await self.bot.store.find_message(message_id)
+                if indexed and indexed[1] == interaction.guild.id:
+                    description = "Aucun résultat enregistré pour ce giveaway."
+                else:
+                    description = "Message non trouvé. Vérifiez l'ID."
+            embed_error = discord.Embed(
+                description=description,
+                color=0xFF0000
+            )
+            await interaction.followup.send(embed=embed_error, ephemeral=True)
+            return
+
+        await self.select_winners(channel.get_partial_message(message_id), interaction, reroll=True, result=result)
+
+    @app_commands.command(name="autorise", description="Autorise un utilisateur aux commandes giveaway")
+    async def autorise(self, interaction: discord.Interaction, user: discord.User):
+        if not interaction.user.guild_permissions.administrator:
+            embed_error = discord.Embed(
+                description="Seuls les administrateurs peuvent utiliser cette commande.",
+                color=0xFF0000
+            )
+            await interaction.response.send_message(embed=embed_error, ephemeral=True)
+            return
+
+        self.bot.guild_state(interaction.guild.id).authorized_users.add(user.id)
+        await self.bot.store.add_authorized(interaction.guild.id, user.id)
+        
+        embed_success = discord.Embed(
+            description=f"{user.mention} est maintenant autorisé à utiliser les commandes giveaway sur ce serveur.",
+            color=0x00FF00
+        )
+        await interaction.response.send_message(embed=embed_success, ephemeral=True)
+        self.bot.metrics.observe_ack(interaction, "autorise")
+
+    @app_commands.command(name="recharger", description="Recharge giveaway_cog.py sans redémarrer le bot (main.py non rechargé)")
+    async def recharger(self, interaction: discord.Interaction):
+        """Commandes, bouton, clôtures et tirages sont rechargés ; une modification de main.py demande un redémarrage"""
+        if not await self.bot.is_owner(interaction.user):
+            embed_error = discord.Embed(
+                description="Seul le propriétaire du bot peut utiliser cette commande.",
+                color=0xFF0000
+            )
+            await interaction.response.send_message(embed=embed_error, ephemeral=True)
+            return
+
+        await interaction.response.defer(ephemeral=True)
+        try:
+            # En cas d'échec, discord.py recharge l'ancienne version qui reprend l'état transmis
+            await self.bot.reload_extension(__name__)
+        except commands.ExtensionError as e:
+            embed_error = discord.Embed(
+                description=f"Rechargement impossible : {e}",
+                color=0xFF0000
+            )
+            await interaction.followup.send(embed=embed_error, ephemeral=True)
+            return
+
+        await self.bot.sync_commands()
+        embed_success = discord.Embed(
+            description=(
+                f"Cog rechargé : {len(self.bot.active_giveaways)} giveaway(s) repris sans interruption.\n"
+                "Les modifications de main.py (planificateur, base, suivi des conditions, file d'envoi) "
+                "ne sont prises en compte qu'au redémarrage."
+            ),
+            color=0x00FF00
+        )
+        await interaction.followup.send(embed=embed_success, ephemeral=True)
+
+    @app_commands.command(name="stats", description="Affiche les métriques du bot")
+    async def stats(self, interaction: discord.Interaction):
+        if not interaction.user.guild_permissions.administrator:
+            embed_error = discord.Embed(
+                description="Seuls les administrateurs peuvent utiliser cette commande.",
+                color=0xFF0000
+            )
+            await interaction.response.send_message(embed=embed_error, ephemeral=True)
+            return
+
+        metrics = self.bot.metrics
+        embed = discord.Embed(title="**Statistiques**", color=0xFFFFFF)
+
+        active = self.bot.guild_state(interaction.guild.id).giveaways
+        participants = sum(len(data["participants"]) for data in active.values())
+        embed.add_field(
+            name="Giveaways",
+            value=(
+                f"En cours sur ce serveur : {len(active)}\nParticipants : {participants}\n"
+                f"En cours au total : {len(self.bot.active_giveaways)}\nLatence gateway : {round(self.bot.latency * 1000)}ms"
+            ),
+            inline=False
+        )
+
+        lines = []
+        for (name, label), histogram in sorted(metrics.histograms.items()):
+            title = f"{name} {label}".strip()
+            lines.append(
+                f"`{title}` p50 {histogram.quantile(0.5) * 1000:.0f}ms • "
+                f"p99 {histogram.quantile(0.99) * 1000:.0f}ms • n={histogram.count}"
+            )
+        embed.add_field(name="Latences", value="\n".join(lines)[:1024] or "Aucune mesure", inline=False)
+
+        requests = metrics.counters.get("http_requests", Counter())
+        rate_limits = metrics.counters.get("http_429", Counter())
+        top_routes = "\n".join(f"`{route}` : {count}" for route, count in requests.most_common(5))
+        top_limits = "\n".join(f"`{route}` : {count}" for route, count in rate_limits.most_common(5))
+        embed.add_field(
+            name=f"Requêtes HTTP ({sum(requests.values())})",
+            value=top_routes[:1024] or "Aucune",
+            inline=False
+        )
+        embed.add_field(
+            name=f"Rate limits 429 ({sum(rate_limits.values())})",
+            value=top_limits[:1024] or "Aucun",
+            inline=False
+        )
+
+        await interaction.response.send_message(embed=embed, ephemeral=True)
+
+    @app_commands.command(name="memoire", description="Affiche la mémoire du bot et les plus grosses allocations")
+    async def memoire(self, interaction: discord.Interaction, top: app_commands.Range[int, 1, 25] = 10):
+        if not await self.bot.is_owner(interaction.user):
+            embed_error = discord.Embed(
+                description="Seul le propriétaire du bot peut utiliser cette commande.",
+                color=0xFF0000
+            )
+            await interaction.response.send_message(embed=embed_error, ephemeral=True)
+            return
+
+        await interaction.response.defer(ephemeral=True)
+        memory = self.bot.memory
+        memory.check()
+        sizes = memory.sizes()
+
+        embed = discord.Embed(title="**Mémoire**", color=0xFF0000 if memory.over_hard_limit else 0xFFFFFF)
+        embed.add_field(
+            name="Processus",
+            value=(
+                f"RSS : {memory.rss / 2**20:.0f} Mo\n"
+                f"Limites : {MEMORY_SOFT_LIMIT_MB:g} Mo (nettoyage) • {MEMORY_HARD_LIMIT_MB:g} Mo (refus)\n"
+                f"Nettoyages : {memory.trims}" + (" • **nouveaux giveaways refusés**" if memory.over_hard_limit else "")
+            ),
+            inline=False
+        )
+        embed.add_field(
+            name="Structures",
+            value=(
+                f"Giveaways : {sizes['giveaways']} • participants : {sizes['participants']} "
+                f"({sizes['participant_bytes'] / 2**10:.0f} Ko)\n"
+                f"Suivis vocal/statut : {sizes['tracked_participants']} • anti-spam : {sizes['click_buckets']}\n"
+                f"Cache : {sizes['members']} membres • {sizes['users']} utilisateurs • {sizes['messages']} messages"
+            ),
+            inline=False
+        )
+
+        if tracemalloc.is_tracing():
+            allocations = await asyncio.to_thread(memory.top_allocations, top)
+            lines = [f"`{location}` {size / 2**10:.0f} Ko ({count})" for location, size, count in allocations]
+            embed.add_field(name=f"Top {top} tracemalloc", value="\n".join(lines)[:1024] or "Aucune allocation", inline=False)
+        else:
+            # Le suivi des allocations coûte de la mémoire : il n'est jamais démarré depuis une commande
+            embed.add_field(
+                name="tracemalloc",
+                value="Suivi des allocations désactivé : relancez le bot avec `MEMORY_TRACEMALLOC=1` pour le rapport.",
+                inline=False
+            )
+
+        await interaction.followup.send(embed=embed, ephemeral=True)
+
+    @app_commands.command(name="giveaways", description="Liste les giveaways en cours et récemment terminés")
+    async def giveaways(self, interaction: discord.Interaction, salon: discord.TextChannel = None):
+        if not await self.bot.is_authorized(interaction.user):
+            embed_error = discord.Embed(
+                description="Vous n'êtes pas autorisé à utiliser cette commande.",
+                color=0xFF0000
+            )
+            await interaction.response.send_message(embed=embed_error, ephemeral=True)
+            return
+
+        await interaction.response.defer(ephemeral=True)
+        self.bot.metrics.observe_ack(interaction, "giveaways")
+
+        # Index du serveur : déjà triés par heure de fin, filtrés par salon sans parcourir les autres
+        active = self.bot.guild_state(interaction.guild.id).ending_order(salon.id if salon else None)
+        ended = await self.bot.store.recent_results(interaction.guild.id, GIVEAWAY_LIST_RECENT, salon.id if salon else None)
+
+        lines = []
+        for data in active:
+            status = "⏳ clôture en cours" if data["message_id"] in self.ending else f"fin <t:{int(data['end_time'].timestamp())}:R>"
+            lines.append(
+                f"🎉 **{data['prize']}** • <#{data['channel_id']}> • {len(data['participants'])} participant(s) • {status}"
+            )
+        for result in ended:
+            lines.append(
+                f"🏁 **{result['prize']}** • <#{result['channel_id']}> • {result['participants']} participant(s) • "
+                f"terminé <t:{int(result['ended_at'].timestamp())}:R> • `{result['message_id']}`"
+            )
+
+        title = f"Giveaways ({len(active)} en cours)" + (f" dans #{salon.name}" if salon else "")
+        pages = []
+        for start in range(0, max(len(lines), 1), GIVEAWAY_LIST_PAGE_SIZE):
+            page = discord.Embed(
+                title=title,
+                description="\n".join(lines[start:start + GIVEAWAY_LIST_PAGE_SIZE]) or "Aucun giveaway.",
+                color=0xFFFFFF
+            )
+            pages.append(page)
+        if len(pages) > 1:
+            for number, page in enumerate(pages, 1):
+                page.set_footer(text=f"Page {number}/{len(pages)}")
+
+            view = GiveawayListView(pages, interaction.user.id)
+            view.message = await interaction.followup.send(embed=pages[0], view=view, ephemeral=True, wait=True)
+        else:
+            await interaction.followup.send(embed=pages[0], ephemeral=True)
+
+    @app_commands.command(name="export", description="Exporte les participants et résultats d'un giveaway")
+    @app_commands.choices(format=[
+        app_commands.Choice(name="CSV", value="csv"),
+        app_commands.Choice(name="JSONL", value="jsonl")
+    ])
+    async def export(self, interaction: discord.Interaction, id_du_message: str, format: app_commands.Choice[str] = None):
+        if not await self.bot.is_authorized(interaction.user):
+            embed_error = discord.Embed(
+                description="Vous n'êtes pas autorisé à utiliser cette commande.",
+                color=0xFF0000
+            )
+            await interaction.response.send_message(embed=embed_error, ephemeral=True)
+            return
+
+        await interaction.response.defer(ephemeral=True)
+        self.bot.metrics.observe_ack(interaction, "export")
+
+        try:
+            message_id = int(id_du_message)
+        except ValueError:
+            embed_error = discord.Embed(
+                description="Id du message invalide",
+                color=0xFF0000
+            )
+            await interaction.followup.send(embed=embed_error, ephemeral=True)
+            return
+
+        file_format = format.value if format else "csv"
+        data = self.bot.guild_state(interaction.guild.id).giveaways.get(message_id)
+        result = None if data else await self.bot.store.load_result(message_id)
+        if result and result["guild_id"] not in (None, interaction.guild.id):
+            result = None
+
+        if not data and not result:
+            embed_error = discord.Embed(
+                description="Aucun giveaway trouvé pour cet ID sur ce serveur.",
+                color=0xFF0000
+            )
+            await interaction.followup.send(embed=embed_error, ephemeral=True)
+            return
+
+        path = await self.write_export(message_id, data, result, file_format)
+        try:
+            await interaction.followup.send(
+                file=discord.File(path, filename=f"giveaway_{message_id}.{file_format}"),
+                ephemeral=True
+            )
+        except discord.HTTPException as e:
+            embed_error = discord.Embed(
+                description=f"Impossible d'envoyer l'export : {e}",
+                color=0xFF0000
+            )
+            await interaction.followup.send(embed=embed_error, ephemeral=True)
+        finally:
+            os.remove(path)
+
+    async def write_export(self, message_id: int, data: dict, result: dict, file_format: str) -> str:
+        """Écrit l'export ligne par ligne dans un fichier temporaire et renvoie son chemin"""
+        if data:
+            # Copie compacte (8 octets par participant) : les clics continuent pendant l'export
+            participants = array('Q', data["participants"].tobytes())
+            winners = set()
+            disqualified = None
+            conditional = bool(data.get("conditions_type"))
+        else:
+            participants = result["participants"]
+            winners = result["previous_winners"]
+            disqualified = result["disqualified"]
+            conditional = bool(result.get("conditions_type"))
+
+        tracker = self.bot.participants_data
+        fd, path = tempfile.mkstemp(prefix=f"giveaway_{message_id}_", suffix=f".{file_format}")
+        with os.fdopen(fd, "w", encoding="utf-8", newline="") as file:
+            writer = csv.writer(file) if file_format == "csv" else None
+            if writer:
+                writer.writerow(["user_id", "eligible", "raison", "gagnant"])
+
+            for count, user_id in enumerate(participants, 1):
+                if not conditional:
+                    eligible, reason = "oui", ""
+                elif disqualified is not None:
+                    eligible, reason = ("non", "conditions non remplies") if user_id in disqualified else ("oui", "")
+                else:
+                    verdict = tracker.verdict(message_id, user_id)
+                    if verdict is None:
+                        eligible, reason = "inconnu", "non suivi"
+                    else:
+                        eligible, reason = ("oui" if verdict[0] else "non"), ("" if verdict[0] else verdict[1])
+                winner = "oui" if user_id in winners else "non"
+
+                if writer:
+                    writer.writerow([user_id, eligible, reason, winner])
+                else:
+                    file.write(json.dumps(
+                        {"user_id": str(user_id), "eligible": eligible, "raison": reason, "gagnant": winner},
+                        ensure_ascii=False
+                    ) + "\n")
+
+                # On rend la main régulièrement pour ne pas bloquer la boucle sur un gros giveaway
+                if count % 5000 == 0:
+                    await asyncio.sleep(0)
+        return path
+
+    @app_commands.command(name="logs", description="Affiche le journal vocal / statut d'un membre pendant un giveaway")
+    async def logs(self, interaction: discord.Interaction, utilisateur: discord.User, id_du_message: str):
+        if not interaction.user.guild_permissions.administrator:
+            embed_error = discord.Embed(
+                description="Seuls les administrateurs peuvent utiliser cette commande.",
+                color=0xFF0000
+            )
+            await interaction.response.send_message(embed=embed_error, ephemeral=True)
+            return
+
+        await interaction.response.defer(ephemeral=True)
+        self.bot.metrics.observe_ack(interaction, "logs")
+
+        try:
+            message_id = int(id_du_message)
+        except ValueError:
+            embed_error = discord.Embed(
+                description="Id du message invalide",
+                color=0xFF0000
+            )
+            await interaction.followup.send(embed=embed_error, ephemeral=True)
+            return
+
+        # Fenêtre du giveaway : du lancement à la fin (ou à maintenant s'il est en cours)
+        start = end = None
+        data = self.bot.guild_state(interaction.guild.id).giveaways.get(message_id)
+        if data:
+            duration = parse_duration(data["duration"])
+            start = data["end_time"] - duration if duration else None
+            end = min(clock.now(), data["end_time"])
+        else:
+            result = await self.bot.store.load_result(message_id)
+            if result and result["guild_id"] in (None, interaction.guild.id):
+                start, end = result["started_at"], result["ended_at"]
+
+        if start is None:
+            embed_error = discord.Embed(
+                description="Aucun giveaway trouvé pour cet ID sur ce serveur (ou sa date de lancement est inconnue).",
+                color=0xFF0000
+            )
+            await interaction.followup.send(embed=embed_error, ephemeral=True)
+            return
+
+        events = await self.bot.audit.query(interaction.guild.id, utilisateur.id, start, end)
+        lines = []
+        for timestamp, event, channel_id, state in events:
+            when = datetime.fromtimestamp(timestamp, FRANCE_TZ).strftime('%d/%m %H:%M:%S')
+            line = f"`{when}` {self.bot.audit.LABELS.get(event, '?')}"
+            if channel_id:
+                line += f" <#{channel_id}>"
+            lines.append(line)
+
+        # Limite de taille d'une description d'embed
+        text = ""
+        for index, line in enumerate(lines):
+            if len(text) + len(line) > 3800:
+                text += f"\n… et {len(lines) - index} évènement(s) de plus"
+                break
+            text += line + "\n"
+
+        embed = discord.Embed(
+            title=f"Journal de {utilisateur}",
+            description=text or "Aucun évènement enregistré pendant ce giveaway.",
+            color=0xFFFFFF
+        )
+        embed.set_footer(
+            text=f"Du {start.astimezone(FRANCE_TZ).strftime('%d/%m/%Y %H:%M:%S')} au {end.astimezone(FRANCE_TZ).strftime('%d/%m/%Y %H:%M:%S')}"
+        )
+        await interaction.followup.send(embed=embed, ephemeral=True)
+
+    @commands.Cog.listener()
+    async def on_voice_state_update(self, member: discord.Member, before: discord.VoiceState, after: discord.VoiceState):
+        tracker = self.bot.participants_data
+        if not tracker.users:
+            return
+        if tracker.is_tracked(member.guild.id, member.id):
+            self.bot.audit.record_voice(member, before, after)
+        tracker.refresh(member)
+        if before.channel != after.channel:
+            tracker.refresh_channel(before.channel)
+            tracker.refresh_channel(after.channel)
+
+    @commands.Cog.listener()
+    async def on_presence_update(self, before: discord.Member, after: discord.Member):
+        if self.bot.participants_data.is_tracked(after.guild.id, after.id):
+            self.bot.audit.record_presence(before, after)
+            self.bot.participants_data.refresh(after)
+
+    async def remove_giveaway(self, message_id: int):
+        """Retire un giveaway terminé de la mémoire et de la base"""
+        data = self.bot.pop_giveaway(message_id)
+        self.scheduler.cancel(message_id)
+        self.bot.participants_data.stop_giveaway(message_id)
+        await self.bot.store.delete_giveaway(message_id)
+        if LOW_MEMORY and data:
+            self.bot.prune_member_cache(data["guild_id"])
+
+    async def end_giveaway(self, message_id: int):
+        # Une seule clôture à la fois par giveaway (réveil en double, fin manuelle concurrente...)
+        if message_id in self.ending or message_id not in self.bot.active_giveaways:
+            return
+        self.ending.add(message_id)
+        try:
+            # Fin anticipée possible : on retire l'échéance pour ne pas terminer deux fois
+            self.scheduler.cancel(message_id)
+
+            data = self.bot.active_giveaways[message_id]
+            lateness = (clock.now() - data["end_time"]).total_seconds()
+            self.bot.metrics.observe("end_giveaway_lateness_seconds", max(lateness, 0.0))
+            channel = self.bot.get_channel(data["channel_id"])
+            
+            if not channel:
+                # Salon absent du cache : supprimé, ou serveur momentanément indisponible
+                try:
+                    await self.bot.fetch_channel(data["channel_id"])
+                except discord.NotFound:
+                    await self.abandon_giveaway(message_id, "salon supprimé")
+                    return
+                # Le salon existe : le giveaway est conservé et la clôture retentée
+                await self.retry_ending(message_id)
+                return
+
+            view = data.get("view")
+            if view:
+                view.stop()
+                # L'embed final remplace le footer dans la foulée : pas d'édition intermédiaire
+                view.cancel_footer_update()
+
+            # Clôture déjà commencée (arrêt, échec, rechargement) : si les gagnants ont été tirés, on les reprend
+            self.resuming.discard(message_id)
+            result = await self.bot.store.load_result(message_id)
+
+            # Message partiel : pas de lecture de l'API, un message supprimé lève NotFound à l'édition
+            try:
+                await self.select_winners(channel.get_partial_message(message_id), result=result)
+            except discord.NotFound:
+                await self.remove_giveaway(message_id)
+            
+        except Exception as e:
+            print(f"Erreur end_giveaway ({message_id}): {e}")
+            await self.retry_ending(message_id)
+        finally:
+            self.ending.discard(message_id)
+            if message_id not in self.bot.active_giveaways:
+                self.end_failures.pop(message_id, None)
+
+    async def retry_ending(self, message_id: int):
+        """Replanifie une clôture échouée ; le délai double à chaque échec, jusqu'à une heure"""
+        data = self.bot.active_giveaways.get(message_id)
+        if not data:
+            return
+        failures = self.end_failures.get(message_id, 0) + 1
+        self.end_failures[message_id] = failures
+        if failures > END_MAX_RETRIES:
+            try:
+                await self.abandon_giveaway(message_id, f"{END_MAX_RETRIES} essais de clôture échoués")
+            except Exception as e:
+                print(f"Erreur abandon giveaway ({message_id}): {e}")
+            return
+        delay = min(END_RETRY_DELAY * 2 ** (failures - 1), 3600)
+        # Les gagnants déjà enregistrés avant l'échec sont repris au prochain essai
+        self.resuming.add(message_id)
+        self.scheduler.schedule(message_id, clock.now() + timedelta(seconds=delay), group=data["guild_id"])
+        print(f"🔁 Clôture du giveaway {message_id} retentée dans {delay:g}s (échec n°{failures})")
+
+    async def abandon_giveaway(self, message_id: int, reason: str):
+        """Retire un giveaway impossible à clôturer ; son résultat reste enregistré pour /reroll"""
+        data = self.bot.active_giveaways.get(message_id)
+        if not data:
+            return
+        if await self.bot.store.load_result(message_id) is None:
+            await self.bot.store.save_result(data, data["participants"], [])
+        await self.remove_giveaway(message_id)
+        self.end_failures.pop(message_id, None)
+        print(f"🗑️ Giveaway {message_id} abandonné : {reason}")
+
+    async def check_conditions(self, user, conditions_type, conditions_level, message_id: int = None):
+        """Vérifie si un utilisateur respecte les conditions"""
+        
+        # Giveaway suivi en continu : on juge sur toute la durée, pas seulement au moment du tirage
+        if message_id is not None:
+            verdict = self.bot.participants_data.verdict(message_id, user.id)
+            if verdict is not None:
+                return verdict
+        
+        # Vérifier le statut /akusa
+        has_akusa = has_akusa_status(user)
+        
+        if not has_akusa:
+            return False, "pas le statut /akusa"
+        
+        # Vérifier la présence en vocal
+        if not user.voice or not user.voice.channel:
+            return False, "pas en vocal"
+        
+        # Vérifier les conditions selon le niveau
+        if conditions_level >= 3:
+            # Être démuté
+            if user.voice.self_mute or user.voice.mute:
+                return False, "muet"
+        
+        if conditions_level >= 11:
+            # Être avec d'autres membres (au moins 1 autre personne)
+            if len(user.voice.channel.members) < 2:
+                return False, "seul dans le vocal"
+        
+        return True, "conditions respectées"
+
+    async def eligibility(self, guild: discord.Guild, user_id: int, conditions_type, conditions_level, message_id: int):
+        """Verdict d'un participant : chronologie suivie si disponible, sinon état actuel du membre"""
+        verdict = self.bot.participants_data.verdict(message_id, user_id)
+        if verdict is not None:
+            return verdict
+        member = guild.get_member(user_id)
+        if not member:
+            return False, "absent du serveur"
+        return await self.check_conditions(member, conditions_type, conditions_level)
+
+    async def draw_winners(self, guild: discord.Guild, participants: ParticipantSet, count: int, excluded, drawn=None):
+        """Tire les identifiants puis ne résout que les gagnants (les comptes introuvables sont retirés)
+
+        drawn : gagnants déjà tirés par une clôture interrompue, réutilisés tels quels.
+        """
+        winners = []
+        excluded = set(excluded)
+        while len(winners) < count:
+            if drawn is not None:
+                user_ids, drawn = list(drawn)[:count], []
+            else:
+                user_ids = participants.sample(count - len(winners), exclude=excluded)
+            if not user_ids:
+                break
+            excluded.update(user_ids)
+            if LOW_MEMORY:
+                await self.bot.ensure_members(guild, user_ids)
+            for user_id in user_ids:
+                user = guild.get_member(user_id) or self.bot.get_user(user_id)
+                if user:
+                    winners.append(user)
+        return winners
+
+    async def select_winners(self, message: discord.Message, interaction: discord.Interaction = None, reroll: bool = False, result: dict = None):
+        message_id = message.id
+        
+        if message_id not in self.bot.active_giveaways and not reroll:
+            return
+
+        if not reroll:
+            data = self.bot.active_giveaways[message_id]
+            participants = data["participants"]
+            excluded = set()
+            conditions_frozen = False
+            # Reprise après un arrêt : les gagnants enregistrés avant l'interruption sont conservés
+            drawn = result["previous_winners"] if result else None
+        else:
+            # Reroll : participants figés à la fin du giveaway, anciens gagnants exclus
+            data = dict(result, host_id=None)
+            participants = data["participants"]
+            excluded = set(data["previous_winners"])
+            # Conditions déjà jugées à la fin : les disqualifiés sont simplement exclus
+            conditions_frozen = data["disqualified"] is not None
+            if conditions_frozen:
+                excluded |= data["disqualified"]
+            drawn = None
+
+        winners_count = data["winners"]
+        prize = data["prize"]
+        host_id = data.get("host_id")
+        conditions_type = data.get("conditions_type")
+        conditions_level = data.get("conditions_level")
+
+        guild = message.guild
+        available = len(participants) - sum(1 for user_id in excluded if user_id in participants)
+
+        # Lors d'un reroll, on tire parmi ceux qui restent même s'ils sont moins nombreux
+        if available < (1 if reroll else winners_count):
+            if not reroll:
+                await self.bot.store.save_result(data, participants, [])
+
+            # Cas 4 : Pas assez de participants
+            ping_message = f"Pas assez de participants pour le giveaway **{prize}**."
+            
+            # Modifier l'embed
+            new_embed = discord.Embed(
+                title=f"**Giveaway ({prize}) terminé**",
+                color=0xFFFFFF
+            )
+            new_embed.add_field(name="**Résultat**", value="Pas assez de participants", inline=False)
+            new_embed.set_footer(text=f"Total participants: {len(participants)} • Giveaway terminé")
+            
+            await message.edit(embed=new_embed, view=None)
+            self.bot.outbound.send(message.channel, ping_message, reference=message)
+            
+            # Mentionner l'hôte et supprimer après 2 secondes
+            if host_id:
+                self.bot.outbound.send(message.channel, f"<@{host_id}>", delete_after=2)
+            
+            if not reroll and message_id in self.bot.active_giveaways:
+                await self.remove_giveaway(message_id)
+            return
+
+        winners_valid = []
+        winners_invalid = []
+        disqualified_ids = None
+        disqualified_reasons = {}  # raison -> nombre de participants
+
+        if conditions_type and DRAW_FROM_ELIGIBLE and not conditions_frozen:
+            # Un seul passage sur les participants : on ne tire que parmi ceux qui remplissent les conditions
+            pool = []
+            disqualified_ids = []
+            for user_id in participants:
+                if user_id in excluded:
+                    continue
+                valid, reason = await self.eligibility(guild, user_id, conditions_type, conditions_level, message_id)
+                if valid:
+                    pool.append(user_id)
+                else:
+                    disqualified_ids.append(user_id)
+                    disqualified_reasons[reason] = disqualified_reasons.get(reason, 0) + 1
+
+            selected_winners = await self.draw_winners(guild, ParticipantSet(pool), winners_count, excluded, drawn)
+            winners_valid = selected_winners
+        else:
+            # Sélectionner les gagnants
+            selected_winners = await self.draw_winners(guild, participants, winners_count, excluded, drawn)
+            
+            # Vérifier les conditions pour chaque gagnant (si c'est un pgiveaway)
+            if conditions_type and not conditions_frozen:
+                for winner in selected_winners:
+                    valid, reason = await self.eligibility(guild, winner.id, conditions_type, conditions_level, message_id)
+                    if valid:
+                        winners_valid.append(winner)
+                    else:
+                        winners_invalid.append(winner)
+            else:
+                # Pas de conditions (ou déjà vérifiées), tous les gagnants sont valides
+                winners_valid = selected_winners
+
+        selected_ids = [winner.id for winner in selected_winners]
+        if reroll:
+            await self.bot.store.add_previous_winners(message_id, selected_ids)
+        else:
+            await self.bot.store.save_result(data, participants, selected_ids, disqualified_ids)
+
+        # Construire le message selon les cas
+        valid_mentions = " ".join([w.mention for w in winners_valid])
+        invalid_mentions = " ".join([w.mention for w in winners_invalid])
+        
+        if winners_valid and not winners_invalid:
+            # Cas 1 : Tous valides
+            ping_message = f"{valid_mentions} ont gagné **{prize}** !"
+        elif winners_valid and winners_invalid:
+            # Cas 2 : Certains valides, d'autres non
+            ping_message = f"{valid_mentions} ont gagné **{prize}**\n{invalid_mentions} ont gagné mais n'ont pas les conditions requises"
+        elif not winners_valid and winners_invalid:
+            # Cas 3 : Aucun valide
+            ping_message = f"{invalid_mentions} ont gagné **{prize}** mais il ont pas les condition requises"
+        else:
+            ping_message = f"Personne n'a gagné **{prize}**"
+
+        # Modifier l'embed original
+        new_embed = discord.Embed(
+            title=f"**Giveaway ({prize}) terminé**",
+            color=0xFFFFFF
+        )
+        
+        result_text = f"**Gagnants valides :** {len(winners_valid)}\n**Gagnants non valides :** {len(winners_invalid)}"
+        if disqualified_ids is not None and REPORT_DISQUALIFIED:
+            result_text += f"\n**Participants sans les conditions :** {len(disqualified_ids)}"
+            for reason, count in sorted(disqualified_reasons.items(), key=lambda item: -item[1]):
+                result_text += f"\n`-` {reason} : {count}"
+        new_embed.add_field(name="**Résultat**", value=result_text, inline=False)
+        new_embed.set_footer(text=f"Total participants: {len(participants)} • Giveaway terminé")
+
+        # Supprimer le bouton
+        await message.edit(embed=new_embed, view=None)
+        
+        # Envoyer le message de résultat (les envois passent par la file du salon, dans l'ordre)
+        outbound = self.bot.outbound
+        outbound.send(message.channel, ping_message, reference=message)
+        
+        # Message de vérification pour chaque gagnant valide, regroupés en un minimum de messages
+        check_messages = []
+        for winner in winners_valid:
+            member = message.guild.get_member(winner.id)
+            if member:
+                # Récupérer le statut personnalisé
+                status_text = "pas de statut"
+                for activity in member.activities:
+                    if activity.type == discord.ActivityType.custom:
+                        if activity.name:
+                            status_text = activity.name
+                        break
+                
+                # Vérifier si en vocal
+                if member.voice and member.voice.channel:
+                    check_message = f"{member.mention} est en vocal dans {member.voice.channel.mention} et il a `{status_text}` en status !"
+                else:
+                    check_message = f"{member.mention} n'est pas en vocal et il a `{status_text}` en status !"
+                
+                check_messages.append(check_message)
+        outbound.send_lines(message.channel, check_messages)
+
+        # Mentionner l'hôte et supprimer après 2 secondes (suppression en arrière-plan)
+        if host_id:
+            outbound.send(message.channel, f"<@{host_id}>", delete_after=2)
+
+        if not reroll and message_id in self.bot.active_giveaways:
+            await self.remove_giveaway(message_id)
+
+        if interaction:
+            embed_success = discord.Embed(
+                description=f"Nouveau{'x' if winners_count > 1 else ''} gagnant{'s' if winners_count > 1 else ''} sélectionné{'s' if winners_count > 1 else ''} !",
+                color=0x00FF00
+            )
+            await interaction.followup.send(embed=embed_success, ephemeral=True)
+
+
+async def setup(bot):
+    await bot.add_cog(GiveawayCog(bot))
@@ -1,665 +1,1914 @@
 import os
 import discord
 from discord.ext import commands
-from discord import app_commands
 import asyncio
+import gc
+import hashlib
+import json
+from array import array
+from bisect import bisect_left, insort
+from collections import Counter, deque
 from datetime import datetime, timedelta, timezone
+import heapq
+import logging
+import mmap
 import random
+import re
+import signal
+import sqlite3
+import struct
+import sys
+import threading
+import time
+import tracemalloc
 from typing import Literal
 
+if __name__ == "__main__":
+    # Lancé comme script, ce module s'appelle "__main__" : sans cet alias, le `from main import`
+    # du cog réexécuterait le fichier et créerait un second bot
+    sys.modules["main"] = sys.modules[__name__]
+
 TOKEN = os.getenv('TOKEN')
 
+# ⏱️ Intervalle minimum (en secondes) entre deux éditions du footer d'un giveaway
+FOOTER_UPDATE_INTERVAL = float(os.getenv('FOOTER_UPDATE_INTERVAL', '5'))
+
+# 🚦 Anti-spam du bouton : CLICK_BURST clics d'affilée puis CLICK_RATE clics par seconde et par utilisateur
+CLICK_BURST = float(os.getenv('CLICK_BURST', '3'))
+CLICK_RATE = float(os.getenv('CLICK_RATE', '0.2'))
+
+# 💾 Base SQLite et intervalle d'écriture groupée des participations
+DB_PATH = os.getenv('DB_PATH', 'giveaways.db')
+STORE_FLUSH_INTERVAL = float(os.getenv('STORE_FLUSH_INTERVAL', '2'))
+
+# 🎙️ Part minimale de la durée du giveaway pendant laquelle les conditions doivent être remplies
+ELIGIBILITY_MIN_COVERAGE = float(os.getenv('ELIGIBILITY_MIN_COVERAGE', '0.95'))
+# Couverture mesurée depuis le clic du participant plutôt que depuis le début du giveaway (désactivé par défaut)
+ELIGIBILITY_FROM_CLICK = os.getenv('ELIGIBILITY_FROM_CLICK', '0') == '1'
+
+# 📨 Nombre maximum de messages envoyés par salon toutes les 5 secondes
+OUTBOUND_CHANNEL_RATE = int(os.getenv('OUTBOUND_CHANNEL_RATE', '5'))
+
+# 🏘️ Limites par serveur (0 = illimité)
+MAX_GIVEAWAYS_PER_GUILD = int(os.getenv('MAX_GIVEAWAYS_PER_GUILD', '50'))
+MAX_PARTICIPANTS_PER_GIVEAWAY = int(os.getenv('MAX_PARTICIPANTS_PER_GIVEAWAY', '0'))
+
+# 🏁 Nombre de giveaways terminés en parallèle, délai (en secondes) avant de retenter une clôture échouée
+# et nombre d'essais avant d'abandonner la clôture
+END_CONCURRENCY = int(os.getenv('END_CONCURRENCY', '5'))
+END_RETRY_DELAY = float(os.getenv('END_RETRY_DELAY', '60'))
+END_MAX_RETRIES = int(os.getenv('END_MAX_RETRIES', '10'))
+
+# 📅 Écart (en secondes) entre les lancements d'un même lot de giveaways
+BATCH_SPREAD = float(os.getenv('BATCH_SPREAD', '2'))
+
+# 🧠 Mode mémoire réduite : pas de chargement des membres au démarrage, chargement à la demande
+LOW_MEMORY = os.getenv('LOW_MEMORY', '0') == '1'
+MEMBER_LOAD_DELAY = float(os.getenv('MEMBER_LOAD_DELAY', '1'))
+
+# 🎯 Tirage parmi les seuls participants qui remplissent les conditions (pgiveaway)
+DRAW_FROM_ELIGIBLE = os.getenv('DRAW_FROM_ELIGIBLE', '1') == '1'
+REPORT_DISQUALIFIED = os.getenv('REPORT_DISQUALIFIED', '1') == '1'
+
+# 📈 Métriques : fichier texte réécrit périodiquement et port HTTP local optionnel (0 = désactivé)
+METRICS_FILE = os.getenv('METRICS_FILE', 'metrics.txt')
+METRICS_PORT = int(os.getenv('METRICS_PORT', '0'))
+METRICS_INTERVAL = float(os.getenv('METRICS_INTERVAL', '15'))
+
+# 🔄 Synchronisation des commandes slash : forcée, ou vers un serveur de développement
+FORCE_SYNC = os.getenv('FORCE_SYNC', '0') == '1'
+DEV_GUILD_ID = int(os.getenv('DEV_GUILD_ID')) if os.getenv('DEV_GUILD_ID') else None
+
+# 🧩 Sharding : SHARD_COUNT et SHARD_IDS (ex: "0,1") pour répartir les shards sur plusieurs processus
+SHARD_COUNT = int(os.getenv('SHARD_COUNT')) if os.getenv('SHARD_COUNT') else None
+SHARD_IDS = [int(shard_id) for shard_id in os.getenv('SHARD_IDS').split(',')] if os.getenv('SHARD_IDS') else None
+# Identifiant du groupe de shards de ce processus, pour séparer son état de celui des autres processus
+SHARD_SET = "-".join(str(shard_id) for shard_id in SHARD_IDS) if SHARD_IDS is not None else None
+
+# 📋 /giveaways : lignes par page et nombre de giveaways terminés affichés
+GIVEAWAY_LIST_PAGE_SIZE = int(os.getenv('GIVEAWAY_LIST_PAGE_SIZE', '10'))
+GIVEAWAY_LIST_RECENT = int(os.getenv('GIVEAWAY_LIST_RECENT', '20'))
+
+# 🧮 Mémoire (Mo) : nettoyage des caches au-delà de la limite douce, refus des nouveaux giveaways au-delà de la limite dure
+MEMORY_SOFT_LIMIT_MB = float(os.getenv('MEMORY_SOFT_LIMIT_MB', '400'))
+MEMORY_HARD_LIMIT_MB = float(os.getenv('MEMORY_HARD_LIMIT_MB', '470'))
+MEMORY_CHECK_INTERVAL = float(os.getenv('MEMORY_CHECK_INTERVAL', '30'))
+MEMORY_TRACEMALLOC = os.getenv('MEMORY_TRACEMALLOC', '0') == '1'
+
+# 🛑 Délai maximum (en secondes) pour terminer les clôtures et envois en cours à l'arrêt
+SHUTDOWN_TIMEOUT = float(os.getenv('SHUTDOWN_TIMEOUT', '20'))
+
+# 📜 Journal vocal / statut des participants : dossier, taille d'un segment (en évènements) et segments conservés
+AUDIT_DIR = os.getenv('AUDIT_DIR', 'audit')
+AUDIT_SEGMENT_RECORDS = int(os.getenv('AUDIT_SEGMENT_RECORDS', '100000'))
+AUDIT_MAX_SEGMENTS = int(os.getenv('AUDIT_MAX_SEGMENTS', '50'))
+
 # 🇫🇷 Fuseau horaire France (UTC+1)
 FRANCE_TZ = timezone(timedelta(hours=1))
 
-class GiveawayBot(commands.Bot):
+# 🎥 Enregistrement des évènements gateway reçus (JSON Lines) pour les rejouer avec replay.py
+RECORD_FILE = os.getenv('RECORD_FILE')
+
+class Clock:
+    """Source de temps unique du bot : horloge réelle, ou horloge virtuelle pendant un rejeu"""
+
     def __init__(self):
-        intents = discord.Intents.default()
-        intents.message_content = True
-        intents.reactions = True
-        intents.members = True
-        intents.guilds = True
-        intents.voice_states = True  # Pour vérifier les salons vocaux
-        intents.presences = True  # Pour vérifier les statuts
-        
-        super().__init__(
-            command_prefix="!",
-            intents=intents
-        )
-        
-        self.active_giveaways = {}
-        self.authorized_users = set()
-        self.participants_data = {}  # Stocke les données des participants (vocal, statut, etc.)
+        self._time = time.time
+        self._monotonic = time.monotonic
 
-    async def setup_hook(self):
-        await self.add_cog(GiveawayCog(self))
-        try:
-            synced = await self.tree.sync()
-            print(f"✅ {len(synced)} commandes slash synchronisées")
-        except Exception as e:
-            print(f"❌ Erreur synchronisation: {e}")
+    def use(self, wall, monotonic):
+        """Remplace les sources de temps (fonctions sans argument renvoyant des secondes)"""
+        self._time = wall
+        self._monotonic = monotonic
 
-    async def on_ready(self):
-        print(f"✅ {self.user} est connecté !")
-        print(f"Latence : {round(self.latency * 1000)}ms")
-        
-        await self.change_presence(
-            activity=discord.Game(
-                name="/akusa"
-            ),
-            status=discord.Status.dnd
-        )
-        
-        print(f"📊 Présence : 🔴 Ne pas déranger - Joue à /akusa")
+    def time(self) -> float:
+        return self._time()
 
-class GiveawayView(discord.ui.View):
-    """View pour le bouton de participation"""
+    def monotonic(self) -> float:
+        return self._monotonic()
+
+    def now(self) -> datetime:
+        return datetime.fromtimestamp(self._time(), FRANCE_TZ)
+
+clock = Clock()
+
+def parse_duration(temps: str):
+    """`10s`, `5m`, `2h`, `1j` -> timedelta ; None si l'unité est inconnue ou la durée nulle ou négative,
+    ValueError si le nombre est invalide"""
+    time_unit = temps[-1].lower()
+    time_value = int(temps[:-1])
+    if time_value <= 0:
+        return None
+
+    if time_unit == 's':
+        return timedelta(seconds=time_value)
+    elif time_unit == 'm':
+        return timedelta(minutes=time_value)
+    elif time_unit == 'h':
+        return timedelta(hours=time_value)
+    elif time_unit == 'j':
+        return timedelta(days=time_value)
+    return None
+
+def parse_start(debut: str):
+    """Délai (`2h`) ou date `JJ/MM/AAAA HH:MM` (heure France) -> datetime ; None si invalide ou déjà passée"""
+    try:
+        start = datetime.strptime(debut.strip(), '%d/%m/%Y %H:%M').replace(tzinfo=FRANCE_TZ)
+    except ValueError:
+        pass
+    else:
+        return start if start > clock.now() else None
+    try:
+        delay = parse_duration(debut.strip())
+    except (ValueError, IndexError):
+        return None
+    return clock.now() + delay if delay is not None else None
+
+def build_conditions_message(conditions_type: str, nombre: int) -> str:
+    """Message des conditions d'un pgiveaway selon le gain et le nombre de gagnants"""
+    gain_label = "NITRO BOOST" if conditions_type == "nitro" else "DECORATION"
+    role_id = "<@&1466923187534303444>"
     
-    def __init__(self, emoji: str, end_time: datetime, winners: int, prize: str, channel_id: int, message_id: int = None, conditions_type: str = None):
-        super().__init__(timeout=None)
-        self.emoji = emoji
-        self.end_time = end_time
-        self.winners = winners
-        self.prize = prize
-        self.channel_id = channel_id
-        self.message_id = message_id
-        self.conditions_type = conditions_type  # "nitro" ou "deco" ou None
-        self.participants = set()
-        self.message = None
-
-        # ✅ Ajout du bouton avec l'emoji
-        button = discord.ui.Button(
-            style=discord.ButtonStyle.gray,
-            label="participer",
-            emoji=self.emoji,
-            custom_id=f"giveaway_{message_id}" if message_id else None
+    # Construction du message de base
+    if nombre == 1 or nombre == 2:
+        # X1 et X2 : mention rôle seulement
+        condition_vocale = "`-` Etre en vocal **du debut a la fin**"
+        mention = role_id
+        here = ""
+    elif 3 <= nombre <= 10:
+        # X3 à X10 : mention rôle + @here + condition "demute"
+        condition_vocale = "`-` Etre en vocal **du debut a la fin** en etant **demute**"
+        mention = role_id
+        here = "@here"
+    else:
+        # X11 à X15 : mention rôle + @here + condition "demute et avec d'autres membres"
+        condition_vocale = "`-` Etre en vocal **du debut a la fin** en etant **demute** **etre avec d'autres membres**"
+        mention = role_id
+        here = "@here"
+    
+    # Construction du message complet
+    return f"""# {gain_label} X{nombre}
+Condition : {mention} {here}
+
+{condition_vocale}
+
+`-` Avoir `/akusa` **en status** du __debut__ a la __fin__
+
+
+__Sa ne sert a rien de se connecter a la fin, on vois tout grace au logs__"""
+
+def has_akusa_status(member) -> bool:
+    for activity in member.activities:
+        if activity.type == discord.ActivityType.custom and activity.name and "/akusa" in activity.name:
+            return True
+    return False
+
+class ParticipantTimeline:
+    """Temps cumulé pendant lequel chaque condition a été remplie par un participant"""
+
+    __slots__ = ("covered", "since", "joined")
+
+    def __init__(self, joined: float):
+        self.covered = [0.0] * 5  # Secondes cumulées par condition
+        self.since = [None] * 5  # Début de la période en cours (None si la condition n'est pas remplie)
+        self.joined = joined  # Début du suivi (clic sur le bouton)
+
+    def update(self, flags, now: float):
+        for i, flag in enumerate(flags):
+            if flag and self.since[i] is None:
+                self.since[i] = now
+            elif not flag and self.since[i] is not None:
+                self.covered[i] += now - self.since[i]
+                self.since[i] = None
+
+    def value(self, index: int, now: float) -> float:
+        since = self.since[index]
+        return self.covered[index] + (now - since if since is not None else 0.0)
+
+class EligibilityTracker:
+    """Suit en continu le vocal et le statut des participants des giveaways à conditions"""
+
+    VOICE, UNMUTED, NOT_ALONE, STATUS, ALL = range(5)
+
+    # Conditions vérifiées dans l'ordre, avec le niveau à partir duquel elles s'appliquent
+    REASONS = [
+        (STATUS, 1, "pas le statut /akusa"),
+        (VOICE, 1, "pas en vocal"),
+        (UNMUTED, 3, "muet"),
+        (NOT_ALONE, 11, "seul dans le vocal"),
+    ]
+
+    def __init__(self):
+        self.giveaways = {}  # message_id -> {"guild_id", "level", "start", "timelines": {user_id: ParticipantTimeline}}
+        self.users = {}  # (guild_id, user_id) -> set des message_id suivis
+
+    def start_giveaway(self, message_id: int, guild_id: int, level: int, start: float = None):
+        self.giveaways[message_id] = {
+            "guild_id": guild_id,
+            "level": level,
+            "start": start if start is not None else clock.time(),
+            "timelines": {}
+        }
+
+    def stop_giveaway(self, message_id: int):
+        giveaway = self.giveaways.pop(message_id, None)
+        if not giveaway:
+            return
+        for user_id in giveaway["timelines"]:
+            self._unlink(giveaway["guild_id"], user_id, message_id)
+
+    def add_participant(self, message_id: int, user_id: int, member: discord.Member = None):
+        giveaway = self.giveaways.get(message_id)
+        if not giveaway or user_id in giveaway["timelines"]:
+            return
+        now = clock.time()
+        timeline = ParticipantTimeline(now)
+        giveaway["timelines"][user_id] = timeline
+        self.users.setdefault((giveaway["guild_id"], user_id), set()).add(message_id)
+        if member:
+            timeline.update(self._flags(member, giveaway["level"]), now)
+
+    def remove_participant(self, message_id: int, user_id: int):
+        giveaway = self.giveaways.get(message_id)
+        if giveaway and giveaway["timelines"].pop(user_id, None):
+            self._unlink(giveaway["guild_id"], user_id, message_id)
+
+    def _unlink(self, guild_id: int, user_id: int, message_id: int):
+        key = (guild_id, user_id)
+        message_ids = self.users.get(key)
+        if message_ids:
+            message_ids.discard(message_id)
+            if not message_ids:
+                del self.users[key]
+
+    def is_tracked(self, guild_id: int, user_id: int) -> bool:
+        return (guild_id, user_id) in self.users
+
+    def _flags(self, member, level: int):
+        voice = member.voice
+        in_voice = bool(voice and voice.channel)
+        unmuted = in_voice and not (voice.self_mute or voice.mute)
+        not_alone = in_voice and len(voice.channel.members) >= 2
+        status = has_akusa_status(member)
+        valid = (
+            status and in_voice
+            and (unmuted or level < 3)
+            and (not_alone or level < 11)
         )
-        button.callback = self.participate_button
-        self.add_item(button)
+        return (in_voice, unmuted, not_alone, status, valid)
 
-    async def participate_button(self, interaction: discord.Interaction):
-        """Bouton de participation - toggle participation"""
-        
-        if interaction.user.bot:
-            await interaction.response.send_message("Les bots ne peuvent pas participer !", ephemeral=True)
+    def refresh(self, member: discord.Member):
+        """Met à jour les chronologies d'un membre suivi après un changement de vocal ou de statut"""
+        message_ids = self.users.get((member.guild.id, member.id))
+        if not message_ids:
             return
+        now = clock.time()
+        for message_id in message_ids:
+            giveaway = self.giveaways[message_id]
+            giveaway["timelines"][member.id].update(self._flags(member, giveaway["level"]), now)
 
-        user_id = interaction.user.id
-        
-        if user_id in self.participants:
-            self.participants.remove(user_id)
-            await interaction.response.send_message("Vous ne participez plus au giveaway", ephemeral=True)
-        else:
-            self.participants.add(user_id)
-            await interaction.response.send_message("Votre participation est bien enregistrée", ephemeral=True)
+    def refresh_channel(self, channel):
+        # "Pas seul dans le vocal" dépend aussi des autres membres du salon
+        if channel is None:
+            return
+        for member in channel.members:
+            self.refresh(member)
 
-        if self.message:
-            embed = self.message.embeds[0]
-            # 🇫🇷 Heure France (UTC+1)
-            france_time = self.end_time.astimezone(FRANCE_TZ)
-            embed.set_footer(text=f"Participants: {len(self.participants)} • Fin: {france_time.strftime('%d/%m/%Y %H:%M:%S')}")
-            await self.message.edit(embed=embed)
+    def refresh_all(self, bot: commands.Bot):
+        """Resynchronise tous les participants suivis depuis le cache (après une (re)connexion)"""
+        for guild_id, user_id in list(self.users):
+            guild = bot.get_guild(guild_id)
+            member = guild.get_member(user_id) if guild else None
+            if member:
+                self.refresh(member)
 
-class GiveawayCog(commands.Cog):
-    def __init__(self, bot):
-        self.bot = bot
-        self.bot.loop.create_task(self.check_expired_giveaways())
+    def verdict(self, message_id: int, user_id: int):
+        """Renvoie (valide, raison) selon la couverture sur toute la durée du giveaway, ou None si non suivi
+
+        Le suivi ne commence qu'au clic : le temps écoulé avant compte comme non couvert,
+        les conditions devant être remplies du début à la fin. Avec ELIGIBILITY_FROM_CLICK,
+        la couverture est mesurée depuis le clic.
+        """
+        giveaway = self.giveaways.get(message_id)
+        if not giveaway:
+            return None
+        timeline = giveaway["timelines"].get(user_id)
+        if timeline is None:
+            return None
+
+        now = clock.time()
+        start = max(giveaway["start"], timeline.joined) if ELIGIBILITY_FROM_CLICK else giveaway["start"]
+        window = max(now - start, 1.0)
+        if timeline.value(self.ALL, now) / window >= ELIGIBILITY_MIN_COVERAGE:
+            return True, "conditions respectées"
+
+        # Conditions tenues depuis le clic, mais clic trop tardif : la vraie raison est l'arrivée en cours de route
+        since_click = max(now - timeline.joined, 1.0)
+        if timeline.joined > start and timeline.value(self.ALL, now) / since_click >= ELIGIBILITY_MIN_COVERAGE:
+            return False, "participation en cours de giveaway"
+
+        for index, level, reason in self.REASONS:
+            if giveaway["level"] >= level and timeline.value(index, now) / window < ELIGIBILITY_MIN_COVERAGE:
+                return False, reason
+        return False, "conditions non remplies du début à la fin"
+
+class OutboundQueue:
+    """File d'envoi : messages d'un même salon envoyés dans l'ordre, salons traités en parallèle"""
+
+    MAX_LENGTH = 2000
 
-    async def check_expired_giveaways(self):
-        await self.bot.wait_until_ready()
-        while not self.bot.is_closed():
+    def __init__(self):
+        self._queues = {}  # channel_id -> asyncio.Queue
+        self._workers = {}  # channel_id -> tâche d'envoi
+        self._recent_sends = {}  # channel_id -> heures des derniers envois
+        self._deletions = {}  # tâche de suppression -> (channel_id, message_id)
+
+    def send(self, channel, content: str, reference=None, delete_after: float = None) -> asyncio.Future:
+        """Met un message en file ; le Future renvoyé contient le message envoyé (ou None en cas d'échec)"""
+        future = asyncio.get_running_loop().create_future()
+        queue = self._queues.get(channel.id)
+        if queue is None:
+            queue = self._queues[channel.id] = asyncio.Queue()
+            self._workers[channel.id] = asyncio.create_task(self._worker(channel.id, queue))
+        queue.put_nowait((channel, content, reference, delete_after, future))
+        return future
+
+    def send_lines(self, channel, lines):
+        """Regroupe des lignes dans le moins de messages possible (2000 caractères max par message)"""
+        futures = []
+        chunk = ""
+        for line in lines:
+            if chunk and len(chunk) + 1 + len(line) > self.MAX_LENGTH:
+                futures.append(self.send(channel, chunk))
+                chunk = ""
+            chunk = f"{chunk}\n{line}" if chunk else line
+        if chunk:
+            futures.append(self.send(channel, chunk))
+        return futures
+
+    async def _wait_rate_limit(self, channel_id: int):
+        loop = asyncio.get_running_loop()
+        recent = self._recent_sends.setdefault(channel_id, deque(maxlen=OUTBOUND_CHANNEL_RATE))
+        if len(recent) == OUTBOUND_CHANNEL_RATE:
+            delay = recent[0] + 5 - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+        recent.append(loop.time())
+
+    async def _worker(self, channel_id: int, queue: asyncio.Queue):
+        while not queue.empty():
+            channel, content, reference, delete_after, future = queue.get_nowait()
+            message = None
             try:
-                current_time = datetime.now(FRANCE_TZ)  # 🇫🇷 Heure France
-                expired = []
-                
-                for message_id, data in self.bot.active_giveaways.items():
-                    if current_time >= data["end_time"]:
-                        expired.append(message_id)
-                
-                for message_id in expired:
-                    await self.end_giveaway(message_id)
-                
-                await asyncio.sleep(60)
+                await self._wait_rate_limit(channel_id)
+                message = await channel.send(content, reference=reference)
+                if delete_after is not None:
+                    # Suppression en arrière-plan sans bloquer la file, suivie pour l'arrêt
+                    self._schedule_delete(message, delete_after)
             except Exception as e:
-                print(f"Erreur check_expired_giveaways: {e}")
-                await asyncio.sleep(60)
-
-    @app_commands.command(name="giveaway", description="Lance un giveaway")
-    async def giveaway(
-        self, 
-        interaction: discord.Interaction, 
-        gain: str,
-        temps: str,
-        salon: discord.TextChannel,
-        nombre_de_gagnants: app_commands.Range[int, 1, 25],
-        emoji: str = "🎉"
-    ):
-        """Commande slash pour créer un giveaway - Nombre de gagnants OBLIGATOIRE"""
-        
-        if (interaction.user.id not in self.bot.authorized_users and 
-            not interaction.user.guild_permissions.administrator):
-            embed_error = discord.Embed(
-                description="Vous n'êtes pas autorisé à utiliser cette commande.",
-                color=0xFF0000
-            )
-            await interaction.response.send_message(embed=embed_error, ephemeral=True)
-            return
+                print(f"Erreur envoi message ({channel_id}): {e}")
+            finally:
+                queue.task_done()
+                if not future.done():
+                    future.set_result(message)
+
+        # File vide : le worker s'arrête, un nouveau sera créé au prochain envoi
+        del self._queues[channel_id]
+        del self._workers[channel_id]
+        # Les derniers envois restent comptés 5 s : une rafale qui arrive juste après est aussi cadencée
+        recent = self._recent_sends.get(channel_id)
+        if recent:
+            loop = asyncio.get_running_loop()
+            loop.call_later(max(recent[-1] + 5 - loop.time(), 0), self._forget_sends, channel_id)
+
+    def _forget_sends(self, channel_id: int):
+        recent = self._recent_sends.get(channel_id)
+        if channel_id not in self._workers and recent and recent[-1] + 5 <= asyncio.get_running_loop().time():
+            del self._recent_sends[channel_id]
 
-        await interaction.response.defer(ephemeral=True)
+    def _schedule_delete(self, message, delay: float):
+        task = asyncio.create_task(self._delete_later(message, delay))
+        self._deletions[task] = (message.channel.id, message.id)
+        task.add_done_callback(lambda done: self._deletions.pop(done, None))
 
+    async def _delete_later(self, message, delay: float):
+        await asyncio.sleep(delay)
         try:
-            time_unit = temps[-1].lower()
-            time_value = int(temps[:-1])
-            
-            if time_unit == 's':
-                duration = timedelta(seconds=time_value)
-            elif time_unit == 'm':
-                duration = timedelta(minutes=time_value)
-            elif time_unit == 'h':
-                duration = timedelta(hours=time_value)
-            elif time_unit == 'j':
-                duration = timedelta(days=time_value)
-            else:
-                embed_error = discord.Embed(
-                    description="Format de temps invalide. Utilisez `s`, `m`, `h` ou `j`",
-                    color=0xFF0000
-                )
-                await interaction.followup.send(embed=embed_error, ephemeral=True)
-                return
-
-            # 🇫🇷 Heure de fin en France (UTC+1)
-            end_time = datetime.now(FRANCE_TZ) + duration
-
-            embed = discord.Embed(
-                title="**Giveaway**",
-                description=f"```\nGain : {gain}\n\nDurée : {temps}\n\nNombre de gagnants : {nombre_de_gagnants}\n\n```",
-                color=0xFFFFFF
-            )
-            
-            embed.add_field(name="\u200b", value="───────────────────", inline=False)
-            # 🇫🇷 Affichage heure France
-            embed.set_footer(text=f"Participants: 0 • Fin: {end_time.strftime('%d/%m/%Y %H:%M:%S')}")
-
-            view = GiveawayView(emoji, end_time, nombre_de_gagnants, gain, salon.id)
-            
-            giveaway_message = await salon.send(embed=embed, view=view)
-            view.message = giveaway_message
-            view.message_id = giveaway_message.id
-            
-            self.bot.active_giveaways[giveaway_message.id] = {
-                "end_time": end_time,
-                "winners": nombre_de_gagnants,
-                "prize": gain,
-                "emoji": emoji,
-                "channel_id": salon.id,
-                "message_id": giveaway_message.id,
-                "host_id": interaction.user.id,
-                "view": view,
-                "participants": view.participants,
-                "conditions_type": None
-            }
+            await message.delete()
+        except discord.HTTPException:
+            pass
 
-            embed_confirm = discord.Embed(
-                description=f"Le giveaway **{gain}** est lancé dans le salon {salon.mention}",
-                color=0x00FF00
-            )
-            await interaction.followup.send(embed=embed_confirm, ephemeral=True)
+    def pending_deletions(self):
+        """(channel_id, message_id) des messages dont la suppression n'a pas encore eu lieu"""
+        return list(self._deletions.values())
 
-        except ValueError:
-            embed_error = discord.Embed(
-                description="Format de temps invalide. Exemple: `10s`, `5m`, `2h`, `1j`",
-                color=0xFF0000
-            )
-            await interaction.followup.send(embed=embed_error, ephemeral=True)
-        except Exception as e:
-            embed_error = discord.Embed(
-                description=f"Une erreur est survenue: {str(e)}",
-                color=0xFF0000
-            )
-            await interaction.followup.send(embed=embed_error, ephemeral=True)
-
-    @app_commands.command(name="pgiveaway", description="Lance un giveaway avec conditions prédéfinies")
-    @app_commands.choices(gain=[
-        app_commands.Choice(name="Nitro boost", value="nitro"),
-        app_commands.Choice(name="Décoration", value="deco")
-    ])
-    @app_commands.choices(nombre=[
-        app_commands.Choice(name="1", value=1),
-        app_commands.Choice(name="2", value=2),
-        app_commands.Choice(name="3", value=3),
-        app_commands.Choice(name="4", value=4),
-        app_commands.Choice(name="5", value=5),
-        app_commands.Choice(name="6", value=6),
-        app_commands.Choice(name="7", value=7),
-        app_commands.Choice(name="8", value=8),
-        app_commands.Choice(name="9", value=9),
-        app_commands.Choice(name="10", value=10),
-        app_commands.Choice(name="11", value=11),
-        app_commands.Choice(name="12", value=12),
-        app_commands.Choice(name="13", value=13),
-        app_commands.Choice(name="14", value=14),
-        app_commands.Choice(name="15", value=15),
-    ])
-    async def pgiveaway(
-        self, 
-        interaction: discord.Interaction, 
-        gain: app_commands.Choice[str],
-        nombre: app_commands.Choice[int],
-        temps: str,
-        salon: discord.TextChannel,
-        emoji: str = "🎉"
-    ):
-        """Commande slash pour créer un giveaway personnalisé avec conditions"""
-        
-        if (interaction.user.id not in self.bot.authorized_users and 
-            not interaction.user.guild_permissions.administrator):
-            embed_error = discord.Embed(
-                description="Vous n'êtes pas autorisé à utiliser cette commande.",
-                color=0xFF0000
-            )
-            await interaction.response.send_message(embed=embed_error, ephemeral=True)
+    async def drain(self):
+        """Attend que tous les messages en file soient envoyés et les suppressions programmées faites"""
+        while self._workers or self._deletions:
+            await asyncio.gather(*self._workers.values(), *self._deletions, return_exceptions=True)
+
+class EventRecorder:
+    """Écrit les évènements gateway reçus (une ligne JSON par évènement, horodatée) pour replay.py"""
+
+    SKIPPED = {"TYPING_START"}
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, "a", encoding="utf-8")
+        self.count = 0
+
+    def write(self, raw):
+        if isinstance(raw, bytes):
+            raw = raw.decode("utf-8")
+        payload = json.loads(raw)
+        # Seuls les évènements (op 0) sont rejoués, pas les heartbeats ni les messages de session
+        if payload.get("op") != 0 or payload.get("t") in self.SKIPPED:
             return
+        self._file.write(json.dumps({"time": clock.time(), "t": payload["t"], "d": payload["d"]}, ensure_ascii=False) + "\n")
+        self.count += 1
+
+    def close(self):
+        self._file.close()
+        print(f"🎥 {self.count} évènement(s) enregistré(s) dans {self.path}")
+
+class Histogram:
+    """Histogramme à seaux fixes (en secondes)"""
+
+    BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, float("inf"))
+
+    def __init__(self):
+        self.counts = [0] * len(self.BUCKETS)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        for i, bound in enumerate(self.BUCKETS):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        self.total += value
+        self.count += 1
+
+    def quantile(self, q: float) -> float:
+        """Approximation : borne haute du seau contenant le quantile"""
+        if not self.count:
+            return 0.0
+        target = q * self.count
+        seen = 0
+        for bound, count in zip(self.BUCKETS, self.counts):
+            seen += count
+            if seen >= target:
+                return bound
+        return self.BUCKETS[-1]
+
+class RateLimitLogHandler(logging.Handler):
+    """Compte les 429 signalés par la bibliothèque (elle réessaie seule sans lever d'exception)"""
+
+    def __init__(self, metrics):
+        super().__init__(logging.WARNING)
+        self.metrics = metrics
+
+    def emit(self, record):
+        if "rate limited" in str(record.msg) and len(record.args) >= 2:
+            route = re.sub(r"\d{15,}", "{id}", f"{record.args[0]} {record.args[1]}")
+            self.metrics.inc("http_429", route)
+
+class Metrics:
+    """Compteurs et histogrammes exposés par /stats, un fichier texte et un port local"""
+
+    def __init__(self):
+        self.counters = {}  # nom -> Counter(label -> valeur)
+        self.histograms = {}  # (nom, label) -> Histogram
+        self.gauges = {}  # nom -> fonction renvoyant la valeur courante
+        self._tasks = []
+
+    def inc(self, name: str, label: str = "", value: int = 1):
+        self.counters.setdefault(name, Counter())[label] += value
+
+    def observe(self, name: str, value: float, label: str = ""):
+        histogram = self.histograms.get((name, label))
+        if histogram is None:
+            histogram = self.histograms[(name, label)] = Histogram()
+        histogram.observe(value)
+
+    def observe_ack(self, interaction: discord.Interaction, label: str):
+        """Délai entre la création de l'interaction et sa réponse"""
+        latency = (clock.now() - interaction.created_at).total_seconds()
+        self.observe("interaction_ack_seconds", max(latency, 0.0), label)
+
+    def gauge(self, name: str, getter):
+        self.gauges[name] = getter
+
+    def render(self) -> str:
+        lines = []
+        for name, getter in sorted(self.gauges.items()):
+            lines.append(f"{name} {getter()}")
+        for name, counter in sorted(self.counters.items()):
+            for label, value in sorted(counter.items()):
+                lines.append(f'{name}{{label="{label}"}} {value}' if label else f"{name} {value}")
+        for (name, label), histogram in sorted(self.histograms.items()):
+            tag = f'label="{label}",' if label else ""
+            cumulative = 0
+            for bound, count in zip(Histogram.BUCKETS, histogram.counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else bound
+                lines.append(f'{name}_bucket{{{tag}le="{le}"}} {cumulative}')
+            lines.append(f"{name}_sum{{{tag.rstrip(',')}}} {histogram.total:.6f}")
+            lines.append(f"{name}_count{{{tag.rstrip(',')}}} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+    def instrument(self, bot: commands.Bot):
+        """Compte les requêtes HTTP par route et les 429 signalés par la bibliothèque"""
+        original_request = bot.http.request
+
+        async def request(route, **kwargs):
+            self.inc("http_requests", f"{route.method} {route.path}")
+            return await original_request(route, **kwargs)
+
+        bot.http.request = request
+        logging.getLogger("discord.http").addHandler(RateLimitLogHandler(self))
+
+    async def _monitor_loop_lag(self, interval: float = 0.5):
+        loop = asyncio.get_running_loop()
+        while True:
+            start = loop.time()
+            await asyncio.sleep(interval)
+            self.observe("event_loop_lag_seconds", max(loop.time() - start - interval, 0.0))
+
+    async def _export_loop(self):
+        while True:
+            await asyncio.sleep(METRICS_INTERVAL)
+            try:
+                text = self.render()
+                await asyncio.to_thread(self._write_file, text)
+            except Exception as e:
+                print(f"Erreur export métriques: {e}")
 
-        await interaction.response.defer(ephemeral=True)
+    @staticmethod
+    def _write_file(text: str):
+        # Écriture atomique pour qu'un lecteur ne voie jamais un fichier à moitié écrit
+        tmp_path = f"{METRICS_FILE}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as file:
+            file.write(text)
+        os.replace(tmp_path, METRICS_FILE)
 
+    async def _handle_client(self, reader, writer):
         try:
-            time_unit = temps[-1].lower()
-            time_value = int(temps[:-1])
-            
-            if time_unit == 's':
-                duration = timedelta(seconds=time_value)
-            elif time_unit == 'm':
-                duration = timedelta(minutes=time_value)
-            elif time_unit == 'h':
-                duration = timedelta(hours=time_value)
-            elif time_unit == 'j':
-                duration = timedelta(days=time_value)
-            else:
-                embed_error = discord.Embed(
-                    description="Format de temps invalide. Utilisez `s`, `m`, `h` ou `j`",
-                    color=0xFF0000
-                )
-                await interaction.followup.send(embed=embed_error, ephemeral=True)
-                return
-
-            # Déterminer le libellé du gain
-            gain_label = "NITRO BOOST" if gain.value == "nitro" else "DECORATION"
-            gain_display = "Nitro boost" if gain.value == "nitro" else "Décoration"
-            
-            # 🇫🇷 Heure de fin en France (UTC+1)
-            end_time = datetime.now(FRANCE_TZ) + duration
-
-            embed = discord.Embed(
-                title="**Giveaway**",
-                description=f"```\nGain : {gain_display}\n\nDurée : {temps}\n\nNombre de gagnants : {nombre.value}\n\n```",
-                color=0xFFFFFF
+            await reader.readuntil(b"\r\n\r\n")
+            body = self.render().encode()
+            writer.write(
+                b"HTTP/1.1 200 OK\r\nContent-Type: text/plain; charset=utf-8\r\n"
+                + f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode()
+                + body
             )
-            
-            embed.add_field(name="\u200b", value="───────────────────", inline=False)
-            # 🇫🇷 Affichage heure France
-            embed.set_footer(text=f"Participants: 0 • Fin: {end_time.strftime('%d/%m/%Y %H:%M:%S')}")
-
-            view = GiveawayView(emoji, end_time, nombre.value, gain_display, salon.id, conditions_type=gain.value)
-            
-            # Envoi de l'embed principal
-            giveaway_message = await salon.send(embed=embed, view=view)
-            view.message = giveaway_message
-            view.message_id = giveaway_message.id
-            
-            # Déterminer le message de conditions selon le gain et le nombre
-            conditions_message = ""
-            role_id = "<@&1466923187534303444>"
-            
-            # Construction du message de base
-            if nombre.value == 1 or nombre.value == 2:
-                # X1 et X2 : mention rôle seulement
-                condition_vocale = "`-` Etre en vocal **du debut a la fin**"
-                mention = role_id
-                here = ""
-            elif 3 <= nombre.value <= 10:
-                # X3 à X10 : mention rôle + @here + condition "demute"
-                condition_vocale = "`-` Etre en vocal **du debut a la fin** en etant **demute**"
-                mention = role_id
-                here = "@here"
+            await writer.drain()
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def start(self):
+        self._tasks.append(asyncio.create_task(self._monitor_loop_lag()))
+        if METRICS_FILE:
+            self._tasks.append(asyncio.create_task(self._export_loop()))
+        if METRICS_PORT:
+            server = await asyncio.start_server(self._handle_client, "127.0.0.1", METRICS_PORT)
+            self._tasks.append(asyncio.create_task(server.serve_forever()))
+
+    def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        self._tasks.clear()
+
+class AuditLog:
+    """Journal binaire en ajout seul des évènements vocal / statut des participants suivis
+
+    Les évènements sont écrits dans des segments de taille fixe. Chaque segment a un index
+    (premier / dernier enregistrement de chaque membre, bornes de temps) qui permet de ne lire
+    que les plages utiles, via mmap.
+    """
+
+    RECORD = struct.Struct("<dQQQBB6x")  # horodatage, serveur, membre, salon, évènement, état
+    VOICE_JOIN, VOICE_LEAVE, VOICE_MOVE, MUTE, UNMUTE, STATUS_ON, STATUS_OFF = range(1, 8)
+    IN_VOICE, MUTED, STATUS = 1, 2, 4  # Bits de l'état après l'évènement
+
+    LABELS = {
+        VOICE_JOIN: "rejoint le vocal",
+        VOICE_LEAVE: "quitte le vocal",
+        VOICE_MOVE: "change de salon vocal",
+        MUTE: "coupe son micro",
+        UNMUTE: "réactive son micro",
+        STATUS_ON: "met le statut /akusa",
+        STATUS_OFF: "retire le statut /akusa",
+    }
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.segments = {}  # numéro -> {"first", "last", "count", "users": {"guild:user": [premier, dernier]}}
+        self._current = 0
+        self._last_timestamp = 0.0
+        self._lock = threading.Lock()
+        self._pending = []  # (segment, enregistrement) pas encore écrits
+        self._sealed = []  # Segments pleins dont l'index reste à écrire
+        self._expired = []  # Segments à supprimer (rétention)
+        self._flush_task = None
+
+        os.makedirs(directory, exist_ok=True)
+        self._load()
+
+    def _path(self, number: int, suffix: str = "bin") -> str:
+        return os.path.join(self.directory, f"segment_{number:06d}.{suffix}")
+
+    def _load(self):
+        numbers = sorted(
+            int(name[8:14]) for name in os.listdir(self.directory)
+            if name.startswith("segment_") and name.endswith(".bin")
+        )
+        for number in numbers:
+            index = None
+            # Le dernier segment est encore ouvert : son index est reconstruit à partir des données
+            if number != numbers[-1]:
+                try:
+                    with open(self._path(number, "idx"), encoding="utf-8") as file:
+                        index = json.load(file)
+                except (OSError, ValueError):
+                    pass
+            self.segments[number] = index or self._scan(number)
+        if numbers:
+            self._current = numbers[-1]
+            self._last_timestamp = self.segments[self._current]["last"] or 0.0
+        else:
+            self.segments[0] = self._empty_segment()
+
+    @staticmethod
+    def _empty_segment() -> dict:
+        return {"first": None, "last": None, "count": 0, "users": {}}
+
+    def _scan(self, number: int) -> dict:
+        segment = self._empty_segment()
+        path = self._path(number)
+        size = os.path.getsize(path)
+        count = size // self.RECORD.size
+        if size != count * self.RECORD.size:
+            # Écriture interrompue : l'enregistrement incomplet est retiré pour garder l'alignement
+            os.truncate(path, count * self.RECORD.size)
+        if not count:
+            return segment
+
+        with open(path, "rb") as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            for index, (timestamp, guild_id, user_id, *_rest) in enumerate(self.RECORD.iter_unpack(data)):
+                self._index(segment, index, timestamp, f"{guild_id}:{user_id}")
+        segment["count"] = count
+        return segment
+
+    @staticmethod
+    def _index(segment: dict, index: int, timestamp: float, key: str):
+        if segment["first"] is None:
+            segment["first"] = timestamp
+        segment["last"] = timestamp
+        bounds = segment["users"].get(key)
+        if bounds:
+            bounds[1] = index
+        else:
+            segment["users"][key] = [index, index]
+
+    # --- Écriture ---
+
+    def record(self, member: discord.Member, event: int, channel_id: int = None):
+        segment = self.segments[self._current]
+        if segment["count"] >= AUDIT_SEGMENT_RECORDS:
+            segment = self._rotate()
+
+        # Horodatages croissants dans un segment (recherche dichotomique à la lecture)
+        timestamp = self._last_timestamp = max(clock.time(), self._last_timestamp)
+        voice = member.voice
+        state = 0
+        if voice and voice.channel:
+            state |= self.IN_VOICE
+            if voice.self_mute or voice.mute:
+                state |= self.MUTED
+        if has_akusa_status(member):
+            state |= self.STATUS
+
+        self._index(segment, segment["count"], timestamp, f"{member.guild.id}:{member.id}")
+        segment["count"] += 1
+        self._pending.append((self._current, self.RECORD.pack(
+            timestamp, member.guild.id, member.id, channel_id or 0, event, state
+        )))
+
+    def record_voice(self, member: discord.Member, before: discord.VoiceState, after: discord.VoiceState):
+        if before.channel != after.channel:
+            if before.channel is None:
+                self.record(member, self.VOICE_JOIN, after.channel.id)
+            elif after.channel is None:
+                self.record(member, self.VOICE_LEAVE, before.channel.id)
             else:
-                # X11 à X15 : mention rôle + @here + condition "demute et avec d'autres membres"
-                condition_vocale = "`-` Etre en vocal **du debut a la fin** en etant **demute** **etre avec d'autres membres**"
-                mention = role_id
-                here = "@here"
-            
-            # Construction du message complet
-            conditions_message = f"""# {gain_label} X{nombre.value}
-Condition : {mention} {here}
+                self.record(member, self.VOICE_MOVE, after.channel.id)
+        elif after.channel is not None:
+            was_muted = before.self_mute or before.mute
+            is_muted = after.self_mute or after.mute
+            if was_muted != is_muted:
+                self.record(member, self.MUTE if is_muted else self.UNMUTE, after.channel.id)
 
-{condition_vocale}
+    def record_presence(self, before: discord.Member, after: discord.Member):
+        had_status = has_akusa_status(before)
+        if had_status != has_akusa_status(after):
+            voice = after.voice
+            self.record(after, self.STATUS_OFF if had_status else self.STATUS_ON, voice.channel.id if voice and voice.channel else None)
 
-`-` Avoir `/akusa` **en status** du __debut__ a la __fin__
+    def _rotate(self) -> dict:
+        self._sealed.append(self._current)
+        self._current += 1
+        self.segments[self._current] = self._empty_segment()
+        while len(self.segments) > AUDIT_MAX_SEGMENTS:
+            oldest = min(self.segments)
+            del self.segments[oldest]
+            self._expired.append(oldest)
+        return self.segments[self._current]
 
+    def _write(self, pending, sealed, expired):
+        with self._lock:
+            chunks = {}
+            for number, record in pending:
+                chunks.setdefault(number, []).append(record)
+            for number, records in chunks.items():
+                if number in self.segments:
+                    with open(self._path(number), "ab") as file:
+                        file.write(b"".join(records))
 
-__Sa ne sert a rien de se connecter a la fin, on vois tout grace au logs__"""
-            
-            # Envoi du message de conditions
-            await salon.send(conditions_message)
-            
-            self.bot.active_giveaways[giveaway_message.id] = {
-                "end_time": end_time,
-                "winners": nombre.value,
-                "prize": gain_display,
-                "emoji": emoji,
-                "channel_id": salon.id,
-                "message_id": giveaway_message.id,
-                "host_id": interaction.user.id,
-                "view": view,
-                "participants": view.participants,
-                "conditions_type": gain.value,
-                "conditions_level": nombre.value
-            }
+            for number in sealed:
+                segment = self.segments.get(number)
+                if segment is None:
+                    continue
+                tmp_path = self._path(number, "idx.tmp")
+                with open(tmp_path, "w", encoding="utf-8") as file:
+                    json.dump(segment, file)
+                os.replace(tmp_path, self._path(number, "idx"))
 
-            embed_confirm = discord.Embed(
-                description=f"Le giveaway **{gain_display}** est lancé dans le salon {salon.mention} avec conditions",
-                color=0x00FF00
-            )
-            await interaction.followup.send(embed=embed_confirm, ephemeral=True)
+            for number in expired:
+                for suffix in ("bin", "idx"):
+                    try:
+                        os.remove(self._path(number, suffix))
+                    except FileNotFoundError:
+                        pass
 
-        except ValueError:
-            embed_error = discord.Embed(
-                description="Format de temps invalide. Exemple: `10s`, `5m`, `2h`, `1j`",
-                color=0xFF0000
-            )
-            await interaction.followup.send(embed=embed_error, ephemeral=True)
-        except Exception as e:
-            embed_error = discord.Embed(
-                description=f"Une erreur est survenue: {str(e)}",
-                color=0xFF0000
-            )
-            await interaction.followup.send(embed=embed_error, ephemeral=True)
-
-    @app_commands.command(name="reroll", description="Choisit de nouveaux gagnants pour un giveaway")
-    async def reroll(self, interaction: discord.Interaction, id_du_message: str):
-        if (interaction.user.id not in self.bot.authorized_users and 
-            not interaction.user.guild_permissions.administrator):
-            embed_error = discord.Embed(
-                description="Vous n'êtes pas autorisé à utiliser cette commande.",
-                color=0xFF0000
-            )
-            await interaction.response.send_message(embed=embed_error, ephemeral=True)
+    async def flush(self):
+        if not (self._pending or self._sealed or self._expired):
             return
+        pending, self._pending = self._pending, []
+        sealed, self._sealed = self._sealed, []
+        expired, self._expired = self._expired, []
+        await asyncio.to_thread(self._write, pending, sealed, expired)
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(STORE_FLUSH_INTERVAL)
+            try:
+                await self.flush()
+            except Exception as e:
+                print(f"Erreur écriture journal: {e}")
 
-        await interaction.response.defer(ephemeral=True)
+    def start(self):
+        if self._flush_task is None:
+            self._flush_task = asyncio.create_task(self._flush_loop())
 
-        try:
-            message_id = int(id_du_message)
-        except ValueError:
-            embed_error = discord.Embed(
-                description="Id du message invalide",
-                color=0xFF0000
-            )
-            await interaction.followup.send(embed=embed_error, ephemeral=True)
-            return
+    async def close(self):
+        if self._flush_task:
+            self._flush_task.cancel()
+            self._flush_task = None
+        await self.flush()
+
+    # --- Lecture ---
 
-        message = None
-        for channel in interaction.guild.channels:
-            if isinstance(channel, discord.TextChannel):
+    def _read(self, guild_id: int, user_id: int, start: float, end: float):
+        key = f"{guild_id}:{user_id}"
+        events = []
+        with self._lock:
+            for number in sorted(self.segments):
+                segment = self.segments[number]
+                bounds = segment["users"].get(key)
+                if not bounds or segment["first"] > end or segment["last"] < start:
+                    continue
+                path = self._path(number)
                 try:
-                    message = await channel.fetch_message(message_id)
-                    break
-                except:
+                    size = os.path.getsize(path)
+                except FileNotFoundError:
+                    continue
+                first, last = bounds[0], min(bounds[1], size // self.RECORD.size - 1)
+                if last < first:
                     continue
 
-        if not message:
-            embed_error = discord.Embed(
-                description="Message non trouvé. Vérifiez l'ID.",
-                color=0xFF0000
-            )
-            await interaction.followup.send(embed=embed_error, ephemeral=True)
+                with open(path, "rb") as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                    # Seules les pages de la plage [premier, dernier] du membre sont lues
+                    position = bisect_left(
+                        range(first, last + 1), start,
+                        key=lambda index: self.RECORD.unpack_from(data, index * self.RECORD.size)[0]
+                    ) + first
+                    for index in range(position, last + 1):
+                        timestamp, record_guild, record_user, channel_id, event, state = self.RECORD.unpack_from(
+                            data, index * self.RECORD.size
+                        )
+                        if timestamp > end:
+                            break
+                        if record_guild == guild_id and record_user == user_id:
+                            events.append((timestamp, event, channel_id, state))
+        return events
+
+    async def query(self, guild_id: int, user_id: int, start: datetime, end: datetime):
+        """Renvoie les évènements (horodatage, évènement, salon, état) d'un membre entre start et end"""
+        await self.flush()
+        return await asyncio.to_thread(self._read, guild_id, user_id, start.timestamp(), end.timestamp())
+
+class ParticipantSet:
+    """Ensemble compact d'identifiants : tableau trié d'entiers 64 bits (8 octets par participant)"""
+
+    __slots__ = ("_ids",)
+
+    def __init__(self, ids=()):
+        self._ids = array('Q', sorted(set(ids)))
+
+    def __len__(self):
+        return len(self._ids)
+
+    def __iter__(self):
+        return iter(self._ids)
+
+    def __contains__(self, user_id) -> bool:
+        index = bisect_left(self._ids, user_id)
+        return index < len(self._ids) and self._ids[index] == user_id
+
+    def add(self, user_id: int):
+        index = bisect_left(self._ids, user_id)
+        if index == len(self._ids) or self._ids[index] != user_id:
+            self._ids.insert(index, user_id)
+
+    def discard(self, user_id: int):
+        index = bisect_left(self._ids, user_id)
+        if index < len(self._ids) and self._ids[index] == user_id:
+            del self._ids[index]
+
+    def remove(self, user_id: int):
+        if user_id not in self:
+            raise KeyError(user_id)
+        self.discard(user_id)
+
+    def update(self, ids):
+        self._ids = array('Q', sorted(set(self._ids).union(ids)))
+
+    def tobytes(self) -> bytes:
+        return self._ids.tobytes()
+
+    def sample(self, count: int, exclude=()):
+        """Tire jusqu'à `count` identifiants distincts au hasard, sans matérialiser la liste complète"""
+        size = len(self._ids)
+        chosen = []
+        tried = set()
+        while len(chosen) < count and len(tried) < size:
+            if len(tried) > size // 2:
+                # Beaucoup d'exclusions : on finit par un passage exhaustif sur le reste
+                remaining = [index for index in range(size) if index not in tried]
+                random.shuffle(remaining)
+                for index in remaining:
+                    if len(chosen) == count:
+                        break
+                    if self._ids[index] not in exclude:
+                        chosen.append(self._ids[index])
+                break
+
+            index = random.randrange(size)
+            if index in tried:
+                continue
+            tried.add(index)
+            if self._ids[index] not in exclude:
+                chosen.append(self._ids[index])
+        return chosen
+
+class MemoryWatchdog:
+    """Surveille la mémoire du processus et des structures du bot, et réagit aux limites"""
+
+    def __init__(self, bot):
+        self.bot = bot
+        self.rss = 0  # Dernière mesure, en octets
+        self.over_hard_limit = False
+        self.trims = 0
+        self._trimmed_rss = None  # RSS juste après le dernier nettoyage, tant qu'on reste au-dessus de la limite douce
+        self._task = None
+        self._page_size = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+    def read_rss(self) -> int:
+        try:
+            with open("/proc/self/statm") as file:
+                return int(file.read().split()[1]) * self._page_size
+        except (OSError, ValueError, IndexError):
+            # Hors Linux (développement) : pas de mesure, les limites ne s'appliquent pas
+            return 0
+
+    def sizes(self) -> dict:
+        bot = self.bot
+        giveaways = bot.active_giveaways.values()
+        return {
+            "giveaways": len(bot.active_giveaways),
+            "participants": sum(len(data["participants"]) for data in giveaways),
+            # 8 octets par participant (ParticipantSet)
+            "participant_bytes": sum(len(data["participants"]) * 8 for data in giveaways),
+            "click_buckets": sum(len(data["view"]._click_buckets) for data in giveaways if data.get("view")),
+            "tracked_participants": len(bot.participants_data.users),
+            "members": sum(len(guild.members) for guild in bot.guilds),
+            "users": len(bot.users),
+            "messages": len(bot.cached_messages),
+        }
+
+    def trim(self):
+        """Vide les caches reconstructibles : membres hors participants, messages, anti-spam des boutons"""
+        before = self.read_rss()
+        # Les membres retirés ne sont rechargés à la demande (tirages, conditions) qu'en mode mémoire réduite
+        if LOW_MEMORY:
+            self.bot.prune_member_cache()
+        messages = self.bot._connection._messages
+        if messages is not None:
+            messages.clear()
+        for data in self.bot.active_giveaways.values():
+            view = data.get("view")
+            if view:
+                view._click_buckets.clear()
+        gc.collect()
+        self.trims += 1
+        self.bot.metrics.inc("memory_trims")
+        self.rss = self.read_rss()
+        print(f"🧹 Mémoire : {before / 2**20:.0f} Mo → {self.rss / 2**20:.0f} Mo après nettoyage des caches")
+
+    def check(self):
+        self.rss = self.read_rss()
+        if self.rss >= MEMORY_SOFT_LIMIT_MB * 2**20:
+            # Un nettoyage qui n'a pas suffi n'est refait que si la mémoire continue de monter
+            if self._trimmed_rss is None or self.rss > self._trimmed_rss * 1.05:
+                self.trim()
+                self._trimmed_rss = self.rss
+        else:
+            self._trimmed_rss = None
+
+        over = self.rss >= MEMORY_HARD_LIMIT_MB * 2**20
+        if over != self.over_hard_limit:
+            self.over_hard_limit = over
+            if over:
+                print(f"🚨 Mémoire : {self.rss / 2**20:.0f} Mo, nouveaux giveaways refusés (limite {MEMORY_HARD_LIMIT_MB:g} Mo)")
+            else:
+                print(f"✅ Mémoire : {self.rss / 2**20:.0f} Mo, nouveaux giveaways de nouveau acceptés")
+
+    async def _loop(self):
+        while True:
+            await asyncio.sleep(MEMORY_CHECK_INTERVAL)
+            try:
+                self.check()
+            except Exception as e:
+                print(f"Erreur surveillance mémoire: {e}")
+
+    def start(self):
+        if MEMORY_TRACEMALLOC and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        self.check()
+        if self._task is None:
+            self._task = asyncio.create_task(self._loop())
+
+    def stop(self):
+        if self._task:
+            self._task.cancel()
+            self._task = None
+
+    @staticmethod
+    def top_allocations(count: int):
+        """Renvoie les `count` lignes de code qui retiennent le plus de mémoire (tracemalloc doit être actif)"""
+        snapshot = tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+        ))
+        return [
+            (f"{os.path.basename(stat.traceback[0].filename)}:{stat.traceback[0].lineno}", stat.size, stat.count)
+            for stat in snapshot.statistics("lineno")[:count]
+        ]
+
+class GiveawayLimitError(Exception):
+    """Limite d'un serveur atteinte (le message est affiché tel quel à l'utilisateur)"""
+
+class GuildState:
+    """État d'un serveur : ses giveaways en cours (indexés par salon et par heure de fin) et ses utilisateurs autorisés"""
+
+    __slots__ = ("giveaways", "by_end", "by_channel", "authorized_users")
+
+    def __init__(self):
+        self.giveaways = {}  # message_id -> données du giveaway
+        self.by_end = []  # (timestamp de fin, message_id), trié
+        self.by_channel = {}  # channel_id -> set des message_id
+        self.authorized_users = set()
+
+    def add(self, data: dict):
+        message_id = data["message_id"]
+        if message_id in self.giveaways:
+            self.remove(message_id)
+        self.giveaways[message_id] = data
+        insort(self.by_end, (data["end_time"].timestamp(), message_id))
+        self.by_channel.setdefault(data["channel_id"], set()).add(message_id)
+
+    def remove(self, message_id: int):
+        data = self.giveaways.pop(message_id, None)
+        if not data:
             return
+        key = (data["end_time"].timestamp(), message_id)
+        index = bisect_left(self.by_end, key)
+        if index < len(self.by_end) and self.by_end[index] == key:
+            del self.by_end[index]
+        channel_ids = self.by_channel.get(data["channel_id"])
+        if channel_ids:
+            channel_ids.discard(message_id)
+            if not channel_ids:
+                del self.by_channel[data["channel_id"]]
+
+    def ending_order(self, channel_id: int = None):
+        """Giveaways en cours du serveur (ou d'un salon), du plus proche de la fin au plus lointain"""
+        if channel_id is None:
+            return [self.giveaways[message_id] for _, message_id in self.by_end]
+        message_ids = self.by_channel.get(channel_id, ())
+        return sorted((self.giveaways[message_id] for message_id in message_ids), key=lambda data: data["end_time"])
+
+class GiveawayStore:
+    """Persistance SQLite (mode WAL) des giveaways, participants et autorisations"""
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS giveaways (
+        message_id INTEGER PRIMARY KEY,
+        guild_id INTEGER,
+        channel_id INTEGER NOT NULL,
+        host_id INTEGER,
+        custom_id TEXT NOT NULL,
+        end_time REAL NOT NULL,
+        duration TEXT NOT NULL,
+        winners INTEGER NOT NULL,
+        prize TEXT NOT NULL,
+        emoji TEXT NOT NULL,
+        conditions_type TEXT,
+        conditions_level INTEGER
+    );
+    CREATE TABLE IF NOT EXISTS participants (
+        message_id INTEGER NOT NULL,
+        user_id INTEGER NOT NULL,
+        PRIMARY KEY (message_id, user_id)
+    ) WITHOUT ROWID;
+    CREATE TABLE IF NOT EXISTS guild_authorized_users (
+        guild_id INTEGER NOT NULL,
+        user_id INTEGER NOT NULL,
+        PRIMARY KEY (guild_id, user_id)
+    ) WITHOUT ROWID;
+    CREATE TABLE IF NOT EXISTS results (
+        message_id INTEGER PRIMARY KEY,
+        guild_id INTEGER,
+        channel_id INTEGER NOT NULL,
+        host_id INTEGER,
+        prize TEXT NOT NULL,
+        emoji TEXT NOT NULL,
+        winners INTEGER NOT NULL,
+        conditions_type TEXT,
+        conditions_level INTEGER,
+        participants BLOB NOT NULL,
+        previous_winners BLOB NOT NULL,
+        ended_at REAL NOT NULL,
+        disqualified BLOB,
+        started_at REAL
+    );
+    CREATE TABLE IF NOT EXISTS planned_giveaways (
+        plan_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        guild_id INTEGER,
+        channel_id INTEGER NOT NULL,
+        host_id INTEGER,
+        start_time REAL NOT NULL,
+        prize TEXT NOT NULL,
+        duration TEXT NOT NULL,
+        winners INTEGER NOT NULL,
+        emoji TEXT NOT NULL
+    );
+    CREATE TABLE IF NOT EXISTS meta (
+        key TEXT PRIMARY KEY,
+        value TEXT NOT NULL
+    );
+    CREATE TABLE IF NOT EXISTS message_index (
+        message_id INTEGER PRIMARY KEY,
+        channel_id INTEGER NOT NULL,
+        guild_id INTEGER
+    );
+    CREATE INDEX IF NOT EXISTS giveaways_guild_end ON giveaways (guild_id, end_time);
+    CREATE INDEX IF NOT EXISTS giveaways_channel_end ON giveaways (channel_id, end_time);
+    CREATE INDEX IF NOT EXISTS results_guild_ended ON results (guild_id, ended_at);
+    CREATE INDEX IF NOT EXISTS results_channel_ended ON results (channel_id, ended_at);
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._lock = threading.Lock()
+        self._pending = {}  # (message_id, user_id) -> True (ajout) / False (retrait)
+        self._flush_task = None
+        # Une écriture groupée en cours ne doit pas se terminer après la suppression d'un giveaway
+        self._flush_lock = asyncio.Lock()
+
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            # La base peut être partagée par plusieurs processus (un par groupe de shards)
+            self._conn.execute("PRAGMA busy_timeout=5000")
+            self._conn.executescript(self.SCHEMA)
+            self._migrate()
+
+    def _migrate(self):
+        # Colonnes ajoutées après la création de la table
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(results)")}
+        if "disqualified" not in columns:
+            self._conn.execute("ALTER TABLE results ADD COLUMN disqualified BLOB")
+        if "started_at" not in columns:
+            self._conn.execute("ALTER TABLE results ADD COLUMN started_at REAL")
+
+    # --- Accès bas niveau (exécuté dans un thread pour ne pas bloquer la boucle) ---
+
+    def _write(self, statements):
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                for sql, params in statements:
+                    if isinstance(params, list):
+                        self._conn.executemany(sql, params)
+                    else:
+                        self._conn.execute(sql, params)
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
 
-        await self.select_winners(message, interaction, reroll=True)
+    def _read(self, sql, params=()):
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
 
-    @app_commands.command(name="autorise", description="Autorise un utilisateur aux commandes giveaway")
-    async def autorise(self, interaction: discord.Interaction, user: discord.User):
-        if not interaction.user.guild_permissions.administrator:
-            embed_error = discord.Embed(
-                description="Seuls les administrateurs peuvent utiliser cette commande.",
-                color=0xFF0000
+    # --- Giveaways ---
+
+    async def save_giveaway(self, data: dict):
+        await asyncio.to_thread(self._write, [(
+            "INSERT OR REPLACE INTO giveaways VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                data["message_id"], data.get("guild_id"), data["channel_id"], data.get("host_id"),
+                data["custom_id"], data["end_time"].timestamp(), data["duration"], data["winners"],
+                data["prize"], data["emoji"], data.get("conditions_type"), data.get("conditions_level")
             )
-            await interaction.response.send_message(embed=embed_error, ephemeral=True)
-            return
+        )])
 
-        self.bot.authorized_users.add(user.id)
-        
-        embed_success = discord.Embed(
-            description=f"{user.mention} est maintenant autorisé à utiliser les commandes giveaway.",
-            color=0x00FF00
+    async def delete_giveaway(self, message_id: int):
+        # Les participations en attente doivent être écrites avant la suppression
+        async with self._flush_lock:
+            await self._flush()
+            await asyncio.to_thread(self._write, [
+                ("DELETE FROM participants WHERE message_id = ?", (message_id,)),
+                ("DELETE FROM giveaways WHERE message_id = ?", (message_id,)),
+            ])
+
+    async def load_giveaways(self):
+        """Renvoie la liste des giveaways en cours avec leurs participants"""
+        rows = await asyncio.to_thread(self._read, "SELECT * FROM giveaways")
+        participant_rows = await asyncio.to_thread(self._read, "SELECT message_id, user_id FROM participants")
+
+        participants = {}
+        for message_id, user_id in participant_rows:
+            participants.setdefault(message_id, set()).add(user_id)
+
+        giveaways = []
+        for (message_id, guild_id, channel_id, host_id, custom_id, end_time, duration,
+             winners, prize, emoji, conditions_type, conditions_level) in rows:
+            giveaways.append({
+                "end_time": datetime.fromtimestamp(end_time, FRANCE_TZ),
+                "duration": duration,
+                "winners": winners,
+                "prize": prize,
+                "emoji": emoji,
+                "guild_id": guild_id,
+                "channel_id": channel_id,
+                "message_id": message_id,
+                "host_id": host_id,
+                "custom_id": custom_id,
+                "participants": participants.get(message_id, set()),
+                "conditions_type": conditions_type,
+                "conditions_level": conditions_level
+            })
+        return giveaways
+
+    # --- Résultats figés à la fin d'un giveaway (utilisés par /reroll) ---
+
+    async def save_result(self, data: dict, participant_ids, winner_ids, disqualified_ids=None):
+        """disqualified_ids vaut None si les conditions n'ont pas été évaluées pour tous les participants"""
+        disqualified = array('Q', disqualified_ids).tobytes() if disqualified_ids is not None else None
+        if not isinstance(participant_ids, ParticipantSet):
+            participant_ids = ParticipantSet(participant_ids)
+        duration = parse_duration(data["duration"]) if data.get("duration") else None
+        started_at = (data["end_time"] - duration).timestamp() if duration else None
+        await asyncio.to_thread(self._write, [(
+            "INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                data["message_id"], data.get("guild_id"), data["channel_id"], data.get("host_id"),
+                data["prize"], data.get("emoji", "🎉"), data["winners"], data.get("conditions_type"),
+                data.get("conditions_level"), array('Q', participant_ids).tobytes(),
+                array('Q', winner_ids).tobytes(), clock.now().timestamp(), disqualified, started_at
+            )
+        )])
+
+    async def add_previous_winners(self, message_id: int, winner_ids):
+        """Ajoute des gagnants tirés lors d'un reroll à la liste des exclus"""
+        def update():
+            with self._lock:
+                row = self._conn.execute(
+                    "SELECT previous_winners FROM results WHERE message_id = ?", (message_id,)
+                ).fetchone()
+                if row:
+                    previous = array('Q', row[0])
+                    previous.extend(winner_ids)
+                    self._conn.execute(
+                        "UPDATE results SET previous_winners = ? WHERE message_id = ?",
+                        (previous.tobytes(), message_id)
+                    )
+        await asyncio.to_thread(update)
+
+    async def load_result(self, message_id: int):
+        rows = await asyncio.to_thread(self._read, "SELECT * FROM results WHERE message_id = ?", (message_id,))
+        if not rows:
+            return None
+
+        (message_id, guild_id, channel_id, host_id, prize, emoji, winners, conditions_type,
+         conditions_level, participants, previous_winners, ended_at, disqualified, started_at) = rows[0]
+        return {
+            "message_id": message_id,
+            "guild_id": guild_id,
+            "channel_id": channel_id,
+            "host_id": host_id,
+            "prize": prize,
+            "emoji": emoji,
+            "winners": winners,
+            "conditions_type": conditions_type,
+            "conditions_level": conditions_level,
+            "participants": ParticipantSet(array('Q', participants)),
+            "previous_winners": set(array('Q', previous_winners)),
+            "ended_at": datetime.fromtimestamp(ended_at, FRANCE_TZ),
+            "disqualified": set(array('Q', disqualified)) if disqualified is not None else None,
+            "started_at": datetime.fromtimestamp(started_at, FRANCE_TZ) if started_at is not None else None
+        }
+
+    async def recent_results(self, guild_id: int, limit: int, channel_id: int = None):
+        """Derniers giveaways terminés d'un serveur (ou d'un salon), du plus récent au plus ancien"""
+        if channel_id is None:
+            sql, params = "WHERE guild_id = ?", (guild_id, limit)
+        else:
+            sql, params = "WHERE channel_id = ?", (channel_id, limit)
+        rows = await asyncio.to_thread(
+            self._read,
+            "SELECT message_id, channel_id, prize, winners, length(participants) / 8, ended_at FROM results "
+            f"{sql} ORDER BY ended_at DESC LIMIT ?",
+            params
+        )
+        return [
+            {
+                "message_id": message_id,
+                "channel_id": channel_id,
+                "prize": prize,
+                "winners": winners,
+                "participants": participants,
+                "ended_at": datetime.fromtimestamp(ended_at, FRANCE_TZ)
+            }
+            for message_id, channel_id, prize, winners, participants, ended_at in rows
+        ]
+
+    # --- Giveaways planifiés ---
+
+    async def add_planned(self, plans):
+        """Enregistre des lancements planifiés en une transaction et renvoie les plans avec leur plan_id"""
+        def insert():
+            with self._lock:
+                self._conn.execute("BEGIN")
+                try:
+                    for plan in plans:
+                        cursor = self._conn.execute(
+                            "INSERT INTO planned_giveaways (guild_id, channel_id, host_id, start_time, prize, duration, winners, emoji) "
+                            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                            (
+                                plan["guild_id"], plan["channel_id"], plan["host_id"], plan["start_time"].timestamp(),
+                                plan["prize"], plan["duration"], plan["winners"], plan["emoji"]
+                            )
+                        )
+                        plan["plan_id"] = cursor.lastrowid
+                    self._conn.execute("COMMIT")
+                except Exception:
+                    self._conn.execute("ROLLBACK")
+                    raise
+        await asyncio.to_thread(insert)
+        return plans
+
+    async def delete_planned(self, plan_id: int):
+        await asyncio.to_thread(self._write, [
+            ("DELETE FROM planned_giveaways WHERE plan_id = ?", (plan_id,))
+        ])
+
+    async def load_planned(self):
+        rows = await asyncio.to_thread(self._read, "SELECT * FROM planned_giveaways")
+        return [
+            {
+                "plan_id": plan_id,
+                "guild_id": guild_id,
+                "channel_id": channel_id,
+                "host_id": host_id,
+                "start_time": datetime.fromtimestamp(start_time, FRANCE_TZ),
+                "prize": prize,
+                "duration": duration,
+                "winners": winners,
+                "emoji": emoji
+            }
+            for plan_id, guild_id, channel_id, host_id, start_time, prize, duration, winners, emoji in rows
+        ]
+
+    # --- Métadonnées (hash des commandes synchronisées, ...) ---
+
+    async def get_meta(self, key: str):
+        rows = await asyncio.to_thread(self._read, "SELECT value FROM meta WHERE key = ?", (key,))
+        return rows[0][0] if rows else None
+
+    async def set_meta(self, key: str, value: str):
+        await asyncio.to_thread(self._write, [
+            ("INSERT OR REPLACE INTO meta VALUES (?, ?)", (key, value))
+        ])
+
+    # --- Index message -> salon (conservé après la fin des giveaways) ---
+
+    async def index_message(self, message_id: int, channel_id: int, guild_id: int):
+        await asyncio.to_thread(self._write, [
+            ("INSERT OR REPLACE INTO message_index VALUES (?, ?, ?)", (message_id, channel_id, guild_id))
+        ])
+
+    async def find_message(self, message_id: int):
+        """Renvoie (channel_id, guild_id) d'un message de giveaway connu, sinon None"""
+        rows = await asyncio.to_thread(
+            self._read, "SELECT channel_id, guild_id FROM message_index WHERE message_id = ?", (message_id,)
         )
-        await interaction.response.send_message(embed=embed_success, ephemeral=True)
+        return rows[0] if rows else None
+
+    # --- Participants (écriture différée et groupée) ---
+
+    def toggle_participant(self, message_id: int, user_id: int, present: bool):
+        """Enregistre un clic ; l'écriture réelle est faite par lot toutes les STORE_FLUSH_INTERVAL secondes"""
+        self._pending[(message_id, user_id)] = present
+
+    async def flush(self):
+        async with self._flush_lock:
+            await self._flush()
 
-    async def end_giveaway(self, message_id: int):
+    async def _flush(self):
+        if not self._pending:
+            return
+        pending, self._pending = self._pending, {}
+
+        added = [key for key, present in pending.items() if present]
+        removed = [key for key, present in pending.items() if not present]
         try:
-            if message_id not in self.bot.active_giveaways:
-                return
-
-            data = self.bot.active_giveaways[message_id]
-            channel = self.bot.get_channel(data["channel_id"])
-            
-            if not channel:
-                return
-                
+            await asyncio.to_thread(self._write, [
+                ("INSERT OR IGNORE INTO participants VALUES (?, ?)", added),
+                ("DELETE FROM participants WHERE message_id = ? AND user_id = ?", removed),
+            ])
+        except Exception:
+            # Écriture échouée : les clics sont remis en attente, sans écraser ceux arrivés entre-temps
+            for key, present in pending.items():
+                self._pending.setdefault(key, present)
+            raise
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(STORE_FLUSH_INTERVAL)
             try:
-                message = await channel.fetch_message(message_id)
-            except:
-                del self.bot.active_giveaways[message_id]
-                return
+                await self.flush()
+            except Exception as e:
+                print(f"Erreur écriture participants: {e}")
 
-            await self.select_winners(message)
-            
-        except Exception as e:
-            print(f"Erreur end_giveaway: {e}")
+    def start(self):
+        if self._flush_task is None:
+            self._flush_task = asyncio.create_task(self._flush_loop())
 
-    async def check_conditions(self, user, conditions_type, conditions_level):
-        """Vérifie si un utilisateur respecte les conditions"""
-        
-        # Vérifier le statut /akusa
-        has_akusa = False
-        for activity in user.activities:
-            if activity.type == discord.ActivityType.custom and activity.name and "/akusa" in activity.name:
-                has_akusa = True
-                break
-        
-        if not has_akusa:
-            return False, "pas le statut /akusa"
-        
-        # Vérifier la présence en vocal
-        if not user.voice or not user.voice.channel:
-            return False, "pas en vocal"
+    async def close(self):
+        if self._flush_task:
+            self._flush_task.cancel()
+            self._flush_task = None
+        await self.flush()
+        with self._lock:
+            self._conn.close()
+
+    # --- Autorisations ---
+
+    async def add_authorized(self, guild_id: int, user_id: int):
+        await asyncio.to_thread(self._write, [
+            ("INSERT OR IGNORE INTO guild_authorized_users VALUES (?, ?)", (guild_id, user_id))
+        ])
+
+    async def is_authorized(self, guild_id: int, user_id: int) -> bool:
+        rows = await asyncio.to_thread(
+            self._read, "SELECT 1 FROM guild_authorized_users WHERE guild_id = ? AND user_id = ?", (guild_id, user_id)
+        )
+        return bool(rows)
+
+    async def load_authorized(self):
+        """Renvoie les paires (guild_id, user_id) autorisées"""
+        return await asyncio.to_thread(self._read, "SELECT guild_id, user_id FROM guild_authorized_users")
+
+class GiveawayBot(commands.AutoShardedBot):
+    def __init__(self):
+        intents = discord.Intents.default()
+        intents.message_content = True
+        intents.reactions = True
+        intents.members = True
+        intents.guilds = True
+        intents.voice_states = True  # Pour vérifier les salons vocaux
+        intents.presences = True  # Pour vérifier les statuts
         
-        # Vérifier les conditions selon le niveau
-        if conditions_level >= 3:
-            # Être démuté
-            if user.voice.self_mute or user.voice.mute:
-                return False, "muet"
+        options = {}
+        if SHARD_IDS is not None:
+            # Ce processus ne gère qu'une partie des shards
+            options["shard_ids"] = SHARD_IDS
+            options["shard_count"] = SHARD_COUNT
+        elif SHARD_COUNT:
+            options["shard_count"] = SHARD_COUNT
+        if LOW_MEMORY:
+            # Pas de chunking ni de cache de messages. Les flags de cache par défaut restent en place
+            # (un membre qui quitte le vocal perdrait sinon sa présence) : le cache se remplit des
+            # membres vus en vocal, qui rejoignent ou chargés à la demande, et prune_member_cache
+            # le ramène aux participants et hôtes à chaque fin de giveaway
+            options["chunk_guilds_at_startup"] = False
+            options["max_messages"] = None
+        if RECORD_FILE:
+            # Nécessaire pour recevoir on_socket_raw_receive
+            options["enable_debug_events"] = True
         
-        if conditions_level >= 11:
-            # Être avec d'autres membres (au moins 1 autre personne)
-            if len(user.voice.channel.members) < 2:
-                return False, "seul dans le vocal"
+        super().__init__(
+            command_prefix="!",
+            intents=intents,
+            **options
+        )
         
-        return True, "conditions respectées"
+        self.guild_states = {}  # guild_id -> GuildState
+        self.active_giveaways = {}  # Index global message_id -> données (les mêmes objets que dans guild_states)
+        self.participants_data = EligibilityTracker()  # Chronologies vocal / statut des participants
+        self.started_at = time.monotonic()
+        self.startup_phases = []  # (phase, durée en secondes)
+        self.store = GiveawayStore(DB_PATH)
+        # Un journal par groupe de shards : les segments et leurs index ne sont jamais partagés entre processus
+        self.audit = AuditLog(os.path.join(AUDIT_DIR, f"shards_{SHARD_SET}") if SHARD_SET else AUDIT_DIR)
+        self.outbound = OutboundQueue()
+        self.metrics = Metrics()
+        self.recorder = EventRecorder(RECORD_FILE) if RECORD_FILE else None
+        self.memory = MemoryWatchdog(self)
+        self.cog_handoff = None  # État transmis par le cog déchargé à celui qui le remplace
+        self.shutting_down = False  # Arrêt en cours : plus de clics ni de nouveaux giveaways
+        self._members_to_load = {}  # guild_id -> set des user_id à charger
+        self._member_load_task = None
 
-    async def select_winners(self, message: discord.Message, interaction: discord.Interaction = None, reroll: bool = False):
-        message_id = message.id
-        
-        if message_id not in self.bot.active_giveaways and not reroll:
+    def _phase(self, name: str, start: float):
+        self.startup_phases.append((name, time.monotonic() - start))
+
+    async def setup_hook(self):
+        start = time.monotonic()
+        await self.restore_state()
+        self.store.start()
+        self.audit.start()
+        try:
+            # Discloud (et la plupart des hébergeurs) arrêtent le processus avec SIGTERM
+            asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, lambda: asyncio.create_task(self.close()))
+        except NotImplementedError:
+            pass  # Windows
+        self._phase("restauration", start)
+
+        start = time.monotonic()
+        self.metrics.instrument(self)
+        self.metrics.gauge("active_giveaways", lambda: len(self.active_giveaways))
+        self.metrics.gauge("participants", lambda: sum(len(data["participants"]) for data in self.active_giveaways.values()))
+        self.metrics.gauge("tracked_participants", lambda: len(self.participants_data.users))
+        self.metrics.gauge("memory_rss_bytes", lambda: self.memory.rss)
+        self.memory.start()
+        await self.metrics.start()
+        await self.load_extension("giveaway_cog")
+        self._phase("chargement du cog", start)
+
+        start = time.monotonic()
+        await self.sync_commands()
+        self._phase("synchronisation", start)
+
+    def commands_hash(self) -> str:
+        """Empreinte de la définition des commandes slash"""
+        payload = [command.to_dict() for command in self.tree.get_commands()]
+        encoded = json.dumps(payload, sort_keys=True, ensure_ascii=False).encode()
+        return hashlib.sha256(encoded).hexdigest()
+
+    async def sync_commands(self):
+        """Ne synchronise que si les commandes ont changé depuis la dernière synchronisation"""
+        guild = discord.Object(id=DEV_GUILD_ID) if DEV_GUILD_ID else None
+        key = f"commands_hash:{DEV_GUILD_ID or 'global'}"
+        current = self.commands_hash()
+
+        if not FORCE_SYNC and await self.store.get_meta(key) == current:
+            print("✅ Commandes slash inchangées, synchronisation ignorée")
             return
 
-        if not reroll:
-            data = self.bot.active_giveaways[message_id]
-        else:
-            embed = message.embeds[0]
-            description = embed.description
-            
-            gain_line = [line for line in description.split('\n') if 'Gain :' in line][0]
-            gain = gain_line.replace('Gain :', '').strip()
-            
-            winners_line = [line for line in description.split('\n') if 'Nombre de gagnants :' in line][0]
-            winners_count = int(winners_line.replace('Nombre de gagnants :', '').strip())
-            
-            emoji = "🎉"
-            if message.components and message.components[0].children:
-                emoji = message.components[0].children[0].emoji or "🎉"
-            
-            data = {
-                "winners": winners_count,
-                "prize": gain,
-                "emoji": emoji,
-                "host_id": None,
-                "conditions_type": None,
-                "conditions_level": None
-            }
+        try:
+            if guild:
+                self.tree.copy_global_to(guild=guild)
+            synced = await self.tree.sync(guild=guild)
+            await self.store.set_meta(key, current)
+            print(f"✅ {len(synced)} commandes slash synchronisées" + (f" (serveur {DEV_GUILD_ID})" if guild else ""))
+        except Exception as e:
+            print(f"❌ Erreur synchronisation: {e}")
 
-        winners_count = data["winners"]
-        prize = data["prize"]
-        emoji = data.get("emoji", "🎉")
-        host_id = data.get("host_id")
-        conditions_type = data.get("conditions_type")
-        conditions_level = data.get("conditions_level")
+    def owns_guild(self, guild_id: int) -> bool:
+        """Un giveaway appartient au processus qui gère le shard de son serveur"""
+        if SHARD_IDS is None or guild_id is None:
+            return True
+        return (guild_id >> 22) % SHARD_COUNT in SHARD_IDS
 
-        participants = []
-        
-        if not reroll and message_id in self.bot.active_giveaways:
-            view = data.get("view")
-            if view and hasattr(view, 'participants'):
-                for user_id in view.participants:
-                    user = self.bot.get_user(user_id)
-                    if user:
-                        participants.append(user)
-        else:
-            for reaction in message.reactions:
-                if str(reaction.emoji) == emoji:
-                    async for user in reaction.users():
-                        if not user.bot:
-                            participants.append(user)
-                    break
-
-        if len(participants) < winners_count:
-            # Cas 4 : Pas assez de participants
-            ping_message = f"Pas assez de participants pour le giveaway **{prize}**."
-            
-            # Modifier l'embed
-            new_embed = discord.Embed(
-                title=f"**Giveaway ({prize}) terminé**",
-                color=0xFFFFFF
+    def state_key(self, name: str) -> str:
+        """Clé meta propre à ce processus : plusieurs processus de shards peuvent partager la base"""
+        return f"{name}:{SHARD_SET}" if SHARD_SET else name
+
+    def guild_state(self, guild_id: int) -> GuildState:
+        state = self.guild_states.get(guild_id)
+        if state is None:
+            state = self.guild_states[guild_id] = GuildState()
+        return state
+
+    def add_giveaway(self, data: dict):
+        self.guild_state(data["guild_id"]).add(data)
+        self.active_giveaways[data["message_id"]] = data
+
+    def pop_giveaway(self, message_id: int):
+        data = self.active_giveaways.pop(message_id, None)
+        if data:
+            state = self.guild_states.get(data["guild_id"])
+            if state:
+                state.remove(message_id)
+        return data
+
+    def check_giveaway_quota(self, guild_id: int):
+        if self.memory.over_hard_limit:
+            raise GiveawayLimitError("Le bot manque de mémoire pour le moment, réessayez plus tard.")
+        state = self.guild_states.get(guild_id)
+        if MAX_GIVEAWAYS_PER_GUILD and state and len(state.giveaways) >= MAX_GIVEAWAYS_PER_GUILD:
+            raise GiveawayLimitError(f"Ce serveur a déjà {MAX_GIVEAWAYS_PER_GUILD} giveaways en cours.")
+
+    async def is_authorized(self, user: discord.Member) -> bool:
+        state = self.guild_state(user.guild.id)
+        if user.id in state.authorized_users or user.guild_permissions.administrator:
+            return True
+        # Autorisation éventuellement donnée par un autre processus (base partagée)
+        if await self.store.is_authorized(user.guild.id, user.id):
+            state.authorized_users.add(user.id)
+            return True
+        return False
+
+    async def restore_state(self):
+        """Recharge les giveaways en cours après un redémarrage (le cog réenregistre leurs boutons)"""
+        for guild_id, user_id in await self.store.load_authorized():
+            self.guild_state(guild_id).authorized_users.add(user_id)
+
+        for data in await self.store.load_giveaways():
+            # Les giveaways des autres shards sont gérés par leur propre processus
+            if not self.owns_guild(data["guild_id"]):
+                continue
+
+            message_id = data["message_id"]
+            data["participants"] = ParticipantSet(data["participants"])
+            self.add_giveaway(data)
+
+            # La période où le bot était éteint ne peut pas être jugée : le suivi reprend maintenant
+            if data["conditions_type"]:
+                self.participants_data.start_giveaway(message_id, data["guild_id"], data["conditions_level"])
+                for user_id in data["participants"]:
+                    self.participants_data.add_participant(message_id, user_id)
+
+        # Messages que l'arrêt précédent n'a pas eu le temps de supprimer (mentions de l'hôte)
+        leftovers = json.loads(await self.store.get_meta(self.state_key("pending_deletions")) or "[]")
+        if leftovers:
+            await self.store.set_meta(self.state_key("pending_deletions"), "[]")
+            asyncio.create_task(self._delete_leftovers(leftovers))
+
+        if self.active_giveaways:
+            print(f"♻️ {len(self.active_giveaways)} giveaway(s) restauré(s)")
+        if SHARD_IDS is not None:
+            print(f"🧩 Shards gérés : {SHARD_IDS} sur {SHARD_COUNT}")
+
+    def cache_report(self) -> dict:
+        members = sum(len(guild.members) for guild in self.guilds)
+        presences = sum(1 for guild in self.guilds for member in guild.members if member.activities)
+        return {"members": members, "users": len(self.users), "presences": presences}
+
+    def print_cache_report(self, label: str, before: dict = None):
+        after = self.cache_report()
+        if before:
+            print(
+                f"👥 Cache ({label}) : {before['members']} → {after['members']} membres, "
+                f"{before['users']} → {after['users']} utilisateurs, {before['presences']} → {after['presences']} présences"
             )
-            new_embed.add_field(name="**Résultat**", value="Pas assez de participants", inline=False)
-            new_embed.set_footer(text=f"Total participants: {len(participants)} • Giveaway terminé")
-            
-            await message.edit(embed=new_embed, view=None)
-            await message.reply(ping_message)
-            
-            # Mentionner l'hôte et supprimer après 2 secondes
-            if host_id:
-                host = self.bot.get_user(host_id)
-                if host:
-                    host_mention = await message.channel.send(f"{host.mention}")
-                    await asyncio.sleep(2)
-                    await host_mention.delete()
-            
-            if not reroll and message_id in self.bot.active_giveaways:
-                del self.bot.active_giveaways[message_id]
+        else:
+            print(f"👥 Cache ({label}) : {after['members']} membres, {after['users']} utilisateurs, {after['presences']} présences")
+
+    async def ensure_members(self, guild: discord.Guild, user_ids):
+        """Charge (avec leur présence) les membres absents du cache, par lots de 100"""
+        missing = [user_id for user_id in user_ids if guild.get_member(user_id) is None]
+        for i in range(0, len(missing), 100):
+            try:
+                await guild.query_members(user_ids=missing[i:i + 100], presences=True, cache=True)
+            except (asyncio.TimeoutError, discord.ClientException) as e:
+                print(f"Erreur chargement membres: {e}")
+
+    def request_member(self, guild: discord.Guild, user_id: int):
+        """Demande le chargement différé d'un membre (les demandes sont regroupées)"""
+        if guild.get_member(user_id) is not None:
             return
+        self._members_to_load.setdefault(guild.id, set()).add(user_id)
+        if self._member_load_task is None or self._member_load_task.done():
+            self._member_load_task = asyncio.create_task(self._load_requested_members())
 
-        # Sélectionner les gagnants
-        selected_winners = random.sample(participants, min(winners_count, len(participants)))
-        
-        winners_valid = []
-        winners_invalid = []
-        
-        # Vérifier les conditions pour chaque gagnant (si c'est un pgiveaway)
-        if conditions_type:
-            for winner in selected_winners:
-                # Récupérer le membre (pas seulement l'user)
-                member = message.guild.get_member(winner.id)
+    async def _load_requested_members(self):
+        await asyncio.sleep(MEMBER_LOAD_DELAY)
+        pending, self._members_to_load = self._members_to_load, {}
+        for guild_id, user_ids in pending.items():
+            guild = self.get_guild(guild_id)
+            if not guild:
+                continue
+            await self.ensure_members(guild, list(user_ids))
+            for user_id in user_ids:
+                member = guild.get_member(user_id)
                 if member:
-                    valid, reason = await self.check_conditions(member, conditions_type, conditions_level)
-                    if valid:
-                        winners_valid.append(winner)
-                    else:
-                        winners_invalid.append(winner)
-                else:
-                    winners_invalid.append(winner)
-        else:
-            # Pas de conditions, tous les gagnants sont valides
-            winners_valid = selected_winners
+                    self.participants_data.refresh(member)
 
-        # Construire le message selon les cas
-        valid_mentions = " ".join([w.mention for w in winners_valid])
-        invalid_mentions = " ".join([w.mention for w in winners_invalid])
-        
-        if winners_valid and not winners_invalid:
-            # Cas 1 : Tous valides
-            ping_message = f"{valid_mentions} ont gagné **{prize}** !"
-        elif winners_valid and winners_invalid:
-            # Cas 2 : Certains valides, d'autres non
-            ping_message = f"{valid_mentions} ont gagné **{prize}**\n{invalid_mentions} ont gagné mais n'ont pas les conditions requises"
-        elif not winners_valid and winners_invalid:
-            # Cas 3 : Aucun valide
-            ping_message = f"{invalid_mentions} ont gagné **{prize}** mais il ont pas les condition requises"
+    def prune_member_cache(self, guild_id: int = None):
+        """Mode mémoire réduite : ne garde en cache que les participants, hôtes et membres en vocal
+
+        Avec guild_id, seul ce serveur est parcouru (fin d'un de ses giveaways).
+        """
+        if guild_id is None:
+            guilds = self.guilds
+            giveaways = self.active_giveaways.values()
         else:
-            ping_message = f"Personne n'a gagné **{prize}**"
+            guild = self.get_guild(guild_id)
+            guilds = [guild] if guild else []
+            state = self.guild_states.get(guild_id)
+            giveaways = state.giveaways.values() if state else ()
 
-        # Modifier l'embed original
-        new_embed = discord.Embed(
-            title=f"**Giveaway ({prize}) terminé**",
-            color=0xFFFFFF
-        )
-        
-        result_text = f"**Gagnants valides :** {len(winners_valid)}\n**Gagnants non valides :** {len(winners_invalid)}"
-        new_embed.add_field(name="**Résultat**", value=result_text, inline=False)
-        new_embed.set_footer(text=f"Total participants: {len(participants)} • Giveaway terminé")
+        keep = set()
+        for data in giveaways:
+            keep.update(data["participants"])
+            keep.add(data.get("host_id"))
+
+        # Le rapport complet parcourt tous les serveurs : seulement pour un nettoyage global
+        before = self.cache_report() if guild_id is None else None
+        removed = 0
+        for guild in guilds:
+            for member in list(guild.members):
+                if member.id in keep or member.voice or member.id == self.user.id:
+                    continue
+                guild._remove_member(member)
+                removed += 1
+        if before:
+            self.print_cache_report("nettoyage", before)
+        elif removed:
+            print(f"👥 Cache (nettoyage) : {removed} membre(s) retiré(s) du serveur {guild_id}")
+
+    async def _delete_leftovers(self, leftovers):
+        await self.wait_until_ready()
+        for channel_id, message_id in leftovers:
+            try:
+                await self.get_partial_messageable(channel_id).get_partial_message(message_id).delete()
+            except discord.HTTPException:
+                pass
+
+    async def shutdown(self):
+        """Arrêt propre : plus de clics, clôtures et envois en cours terminés dans le délai, état écrit sur disque"""
+        self.shutting_down = True
+        print("🛑 Arrêt en cours...")
+        cog = self.get_cog("GiveawayCog")
+
+        async def drain():
+            if cog:
+                await cog.drain()
+            # Les clôtures terminées ont pu mettre des annonces en file
+            await self.outbound.drain()
+
+        # asyncio.wait n'annule rien à l'échéance : l'état en cours est relevé avant d'interrompre les tâches,
+        # dont les finally vident `ending` et les suppressions programmées
+        draining = asyncio.create_task(drain())
+        done, _ = await asyncio.wait({draining}, timeout=SHUTDOWN_TIMEOUT)
+
+        # Clôtures interrompues ou en échec : reprises au prochain démarrage avec les gagnants déjà tirés
+        interrupted = sorted(cog.ending | cog.resuming) if cog else []
+        pending_deletions = self.outbound.pending_deletions()
+        if not done:
+            print(f"⚠️ Arrêt : tout n'a pas pu être terminé en {SHUTDOWN_TIMEOUT:g}s")
+            draining.cancel()
+            await asyncio.gather(draining, return_exceptions=True)
+
+        try:
+            await self.store.set_meta(self.state_key("resume_endings"), json.dumps(interrupted))
+            await self.store.set_meta(self.state_key("pending_deletions"), json.dumps(pending_deletions))
+        except Exception as e:
+            print(f"Erreur enregistrement de l'état d'arrêt: {e}")
+        if interrupted:
+            print(f"♻️ {len(interrupted)} clôture(s) à reprendre au redémarrage")
+
+        self.metrics.stop()
+        self.memory.stop()
+        if self.recorder:
+            self.recorder.close()
+        await self.audit.close()
+        await self.store.close()
+        print("✅ État enregistré, arrêt terminé")
 
-        # Supprimer le bouton
-        await message.edit(embed=new_embed, view=None)
+    async def close(self):
+        # close() peut être appelé deux fois (signal puis fin de bot.run)
+        if not self.shutting_down:
+            await self.shutdown()
+        await super().close()
+
+    async def on_socket_raw_receive(self, msg):
+        if self.recorder:
+            self.recorder.write(msg)
+
+    async def on_ready(self):
+        self.participants_data.refresh_all(self)
+        print(f"✅ {self.user} est connecté !")
+        if self.startup_phases:
+            # Premier on_ready seulement : les reconnexions ne réaffichent pas les temps de démarrage
+            phases = " • ".join(f"{name} {duration:.2f}s" for name, duration in self.startup_phases)
+            print(f"⏱️ Démarrage : {phases} • prêt après {time.monotonic() - self.started_at:.2f}s")
+            self.startup_phases = []
+        self.print_cache_report("mémoire réduite" if LOW_MEMORY else "normal")
+        print(f"Latence : {round(self.latency * 1000)}ms")
         
-        # Envoyer le message de résultat
-        result_message = await message.reply(ping_message)
+        await self.change_presence(
+            activity=discord.Game(
+                name="/akusa"
+            ),
+            status=discord.Status.dnd
+        )
         
-        # Message de vérification pour chaque gagnant valide
-        for winner in winners_valid:
-            member = message.guild.get_member(winner.id)
-            if member:
-                # Récupérer le statut personnalisé
-                status_text = "pas de statut"
-                for activity in member.activities:
-                    if activity.type == discord.ActivityType.custom:
-                        if activity.name:
-                            status_text = activity.name
-                        break
-                
-                # Vérifier si en vocal
-                if member.voice and member.voice.channel:
-                    check_message = f"{member.mention} est en vocal dans {member.voice.channel.mention} et il a `{status_text}` en status !"
-                else:
-                    check_message = f"{member.mention} n'est pas en vocal et il a `{status_text}` en status !"
-                
-                await message.channel.send(check_message)
-
-        # Mentionner l'hôte et supprimer après 2 secondes
-        if host_id:
-            host = self.bot.get_user(host_id)
-            if host:
-                host_mention = await message.channel.send(f"{host.mention}")
-                await asyncio.sleep(2)
-                await host_mention.delete()
-
-        if not reroll and message_id in self.bot.active_giveaways:
-            del self.bot.active_giveaways[message_id]
-
-        if interaction:
-            embed_success = discord.Embed(
-                description=f"Nouveau{'x' if winners_count > 1 else ''} gagnant{'s' if winners_count > 1 else ''} sélectionné{'s' if winners_count > 1 else ''} !",
-                color=0x00FF00
-            )
-            await interaction.followup.send(embed=embed_success, ephemeral=True)
+        print(f"📊 Présence : 🔴 Ne pas déranger - Joue à /akusa")
+
+class GiveawayScheduler:
+    """Planificateur de fin de giveaways : file de priorité triée par heure de fin"""
+
+    def __init__(self, callback, concurrency: int = 1):
+        self.callback = callback  # Coroutine appelée avec le message_id à échéance
+        self._semaphore = asyncio.Semaphore(max(1, concurrency))
+        self._running = set()  # Tâches de callback en cours
+        self._heap = []  # (timestamp de fin, message_id)
+        self._deadlines = {}  # message_id -> timestamp de fin en vigueur
+        self._groups = {}  # message_id -> serveur, pour répartir les échéances simultanées
+        self._wakeup = asyncio.Event()
+
+    def schedule(self, message_id: int, end_time: datetime, group: int = None):
+        """Planifie (ou replanifie) la fin d'un giveaway"""
+        timestamp = end_time.timestamp()
+        self._deadlines[message_id] = timestamp
+        if group is not None:
+            self._groups[message_id] = group
+        heapq.heappush(self._heap, (timestamp, message_id))
+        self._wakeup.set()
+
+    def reschedule(self, message_id: int, end_time: datetime):
+        self.schedule(message_id, end_time)
+
+    def cancel(self, message_id: int):
+        """Retire un giveaway du planning (l'entrée du tas est ignorée au réveil)"""
+        self._groups.pop(message_id, None)
+        if self._deadlines.pop(message_id, None) is not None:
+            self._wakeup.set()
+
+    def next_deadlines(self, count: int = 5):
+        """Renvoie les prochaines échéances sous forme de (message_id, datetime)"""
+        upcoming = heapq.nsmallest(count, ((ts, mid) for mid, ts in self._deadlines.items()))
+        return [(mid, datetime.fromtimestamp(ts, FRANCE_TZ)) for ts, mid in upcoming]
+
+    def __len__(self):
+        return len(self._deadlines)
+
+    def _pop_stale(self):
+        # Entrées annulées ou replanifiées : on les jette paresseusement
+        while self._heap and self._deadlines.get(self._heap[0][1]) != self._heap[0][0]:
+            heapq.heappop(self._heap)
+
+    async def _dispatch(self, message_id: int):
+        # Une erreur sur un giveaway n'affecte pas les autres
+        try:
+            await self.callback(message_id)
+        except Exception as e:
+            print(f"Erreur scheduler ({message_id}): {e}")
+        finally:
+            self._semaphore.release()
+
+    async def drain(self):
+        """Attend la fin des callbacks en cours"""
+        if self._running:
+            await asyncio.gather(*list(self._running), return_exceptions=True)
+
+    def _pop_due(self, now: float):
+        """Retire du tas toutes les échéances passées, entrelacées serveur par serveur
+
+        Les échéances restent dans `_deadlines` jusqu'à leur lancement : une annulation
+        pendant l'attente est respectée et une échéance non lancée peut être remise au tas.
+        """
+        by_group = {}
+        while True:
+            self._pop_stale()
+            if not self._heap or self._heap[0][0] > now:
+                break
+            entry = heapq.heappop(self._heap)
+            by_group.setdefault(self._groups.get(entry[1]), deque()).append(entry)
+
+        # Tourniquet : un serveur avec beaucoup d'échéances ne passe pas devant les autres
+        due = []
+        queues = list(by_group.values())
+        while queues:
+            for queue in queues:
+                due.append(queue.popleft())
+            queues = [queue for queue in queues if queue]
+        return due
+
+    async def run(self, bot: commands.Bot):
+        await bot.wait_until_ready()
+        while not bot.is_closed():
+            self._wakeup.clear()
+            due = deque(self._pop_due(clock.now().timestamp()))
+            try:
+                while due:
+                    # Au plus `concurrency` callbacks en parallèle, dans l'ordre des échéances
+                    await self._semaphore.acquire()
+                    timestamp, message_id = due.popleft()
+                    if self._deadlines.get(message_id) != timestamp:
+                        # Annulé ou replanifié pendant l'attente
+                        self._semaphore.release()
+                        continue
+                    del self._deadlines[message_id]
+                    self._groups.pop(message_id, None)
+                    task = asyncio.create_task(self._dispatch(message_id))
+                    self._running.add(task)
+                    task.add_done_callback(self._running.discard)
+            except asyncio.CancelledError:
+                # Arrêt ou rechargement : les échéances non lancées retournent dans le tas
+                for entry in due:
+                    heapq.heappush(self._heap, entry)
+                raise
+
+            self._pop_stale()
+            delay = self._heap[0][0] - clock.now().timestamp() if self._heap else None
+            if delay is not None and delay <= 0:
+                continue
+
+            # On dort jusqu'à la prochaine échéance, ou jusqu'à un ajout / une annulation
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+            except asyncio.TimeoutError:
+                pass
 
 bot = GiveawayBot()
 
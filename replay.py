@@ -0,0 +1,366 @@
+"""Rejeu déterministe d'évènements gateway enregistrés, sur une horloge virtuelle.
+
+L'enregistrement se fait en production avec RECORD_FILE (une ligne JSON par
+évènement reçu). Le rejeu réinjecte ces évènements dans GiveawayBot, sans
+connexion à Discord : les appels REST sont servis par une fausse API et le
+temps est virtuel. Quand rien n'est prêt à s'exécuter, la boucle saute
+directement à la prochaine échéance, donc des heures de giveaways se rejouent
+en quelques secondes.
+
+Les messages envoyés par le bot reprennent, salon par salon et dans l'ordre,
+les identifiants enregistrés. Les clics sur les boutons retrouvent ainsi leur
+giveaway. Avec --db, le rejeu part d'une copie de la base de production, et
+les giveaways déjà en cours au début de l'enregistrement sont restaurés.
+
+Exemples :
+    RECORD_FILE=events.jsonl python main.py
+    python replay.py events.jsonl
+    python replay.py events.jsonl --db giveaways.db --tail 72 --output replay.txt
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+from collections import Counter, deque
+
+# Le rejeu travaille sur des fichiers jetables : configuration avant l'import du bot
+_workdir = tempfile.mkdtemp(prefix="giveaway-replay-")
+os.environ['DB_PATH'] = os.path.join(_workdir, "replay.db")
+os.environ['AUDIT_DIR'] = os.path.join(_workdir, "audit")
+os.environ['METRICS_FILE'] = os.path.join(_workdir, "metrics.txt")
+os.environ['METRICS_PORT'] = '0'
+os.environ['METRICS_INTERVAL'] = '3600'
+# Pas de passerelle pour charger les membres à la demande
+os.environ['LOW_MEMORY'] = '0'
+os.environ.pop('RECORD_FILE', None)
+
+import discord
+from discord.webhook.async_ import AsyncWebhookAdapter, async_context
+
+DISCORD_EPOCH = 1420070400000
+
+
+class VirtualClockLoop(asyncio.SelectorEventLoop):
+    """Boucle dont le temps n'avance que par sauts jusqu'à la prochaine échéance
+
+    Le temps reste figé tant qu'un appel tourne dans un thread (écritures SQLite),
+    pour que sa durée réelle ne décale pas les échéances.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._virtual_time = 0.0
+        self._executor_calls = 0
+
+    def time(self):
+        return self._virtual_time
+
+    def run_in_executor(self, executor, func, *args):
+        future = super().run_in_executor(executor, func, *args)
+        self._executor_calls += 1
+        future.add_done_callback(self._executor_done)
+        return future
+
+    def _executor_done(self, future):
+        self._executor_calls -= 1
+
+    def _run_once(self):
+        if not self._ready and not self._stopping and self._scheduled and not self._executor_calls:
+            self._virtual_time = max(self._virtual_time, self._scheduled[0]._when)
+        super()._run_once()
+
+
+class FakeHTTPResponse:
+    def __init__(self, status: int, reason: str):
+        self.status = status
+        self.reason = reason
+
+
+class ReplayAPI:
+    """Fausse API REST : réponses plausibles, latence virtuelle, identifiants de messages enregistrés"""
+
+    def __init__(self, bot_user: dict, application_id: int, recorded_ids, latency: float):
+        self.bot_user = bot_user
+        self.application_id = application_id
+        self.recorded_ids = recorded_ids  # channel_id -> deque des id des messages du bot enregistrés
+        self.latency = latency
+        self.messages = {}  # message_id -> charge du message
+        self.custom_ids = {}  # message_id -> custom_id du bouton dans le rejeu
+        self.requests = Counter()  # route -> nombre de requêtes
+        self._sequence = 0
+
+    def snowflake(self) -> int:
+        self._sequence += 1
+        return ((int(main.clock.time() * 1000) - DISCORD_EPOCH) << 22) | (self._sequence & 0xFFF)
+
+    def _message(self, channel_id: int, payload: dict, message_id: int = None) -> dict:
+        if message_id is None:
+            recorded = self.recorded_ids.get(channel_id)
+            message_id = recorded.popleft() if recorded else self.snowflake()
+        data = {
+            "id": str(message_id),
+            "channel_id": str(channel_id),
+            "author": self.bot_user,
+            "content": payload.get("content") or "",
+            "embeds": payload.get("embeds") or [],
+            "components": payload.get("components") or [],
+            "attachments": [],
+            "mentions": [],
+            "mention_roles": [],
+            "mention_everyone": False,
+            "pinned": False,
+            "tts": False,
+            "type": 0,
+            "flags": 0,
+            "timestamp": main.clock.now().isoformat(),
+            "edited_timestamp": None,
+        }
+        self.messages[message_id] = data
+        for row in data["components"]:
+            for component in row.get("components", []):
+                if component.get("custom_id"):
+                    self.custom_ids[message_id] = component["custom_id"]
+        return data
+
+    @staticmethod
+    def _payload(json_payload=None, form=None, multipart=None) -> dict:
+        if json_payload is not None:
+            return json_payload
+        for part in form or multipart or []:
+            if part.get("name") == "payload_json":
+                return json.loads(part["value"])
+        return {}
+
+    def _not_found(self):
+        return discord.NotFound(FakeHTTPResponse(404, "Not Found"), "Unknown Message")
+
+    async def request(self, route, *, files=None, form=None, **kwargs):
+        """Remplace HTTPClient.request"""
+        self.requests[f"{route.method} {route.path}"] += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+        key = (route.method, route.path)
+        params = route.url.rsplit("/", 1)[-1]
+        if key == ("GET", "/users/@me"):
+            return self.bot_user
+        if key == ("GET", "/oauth2/applications/@me"):
+            return {
+                "id": str(self.application_id), "name": self.bot_user["username"], "icon": None, "description": "",
+                "bot_public": True, "bot_require_code_grant": False, "owner": self.bot_user, "verify_key": "", "flags": 0
+            }
+        if route.method == "PUT" and route.path.endswith("/commands"):
+            return [
+                dict(command, id=str(self.snowflake()), application_id=str(self.application_id), version="1")
+                for command in kwargs.get("json", [])
+            ]
+        if key == ("POST", "/channels/{channel_id}/messages"):
+            return self._message(int(route.channel_id), self._payload(kwargs.get("json"), form))
+        if route.path == "/channels/{channel_id}/messages/{message_id}":
+            message_id = int(params)
+            message = self.messages.get(message_id)
+            if route.method == "DELETE":
+                if self.messages.pop(message_id, None) is None:
+                    raise self._not_found()
+                return None
+            if message is None:
+                raise self._not_found()
+            if route.method == "PATCH":
+                message.update(self._payload(kwargs.get("json"), form))
+                self._message(int(route.channel_id), message, message_id)
+            return message
+        if key == ("GET", "/channels/{channel_id}/messages"):
+            return []
+        return None
+
+
+class ReplayWebhookAdapter(AsyncWebhookAdapter):
+    """Réponses aux interactions et suivis (followups), servis par la fausse API"""
+
+    def __init__(self, api: ReplayAPI):
+        super().__init__()
+        self.api = api
+
+    async def request(self, route, session, *, payload=None, multipart=None, **kwargs):
+        api = self.api
+        api.requests[f"{route.method} {route.path}"] += 1
+        if api.latency:
+            await asyncio.sleep(api.latency)
+        if route.path.endswith("/callback") or route.method == "DELETE":
+            return None
+        # Suivi ou message d'origine : un message éphémère qui n'appartient à aucun salon suivi
+        return api._message(0, api._payload(payload, multipart=multipart), api.snowflake())
+
+
+def load_events(path: str):
+    events = []
+    with open(path, encoding="utf-8") as file:
+        for line in file:
+            if line.strip():
+                events.append(json.loads(line))
+    events.sort(key=lambda event: event["time"])
+    return events
+
+
+def recorded_bot_messages(events, bot_id: int):
+    """Identifiants des messages envoyés par le bot, par salon et dans l'ordre d'envoi"""
+    recorded = {}
+    for event in events:
+        if event["t"] == "MESSAGE_CREATE" and int(event["d"]["author"]["id"]) == bot_id:
+            recorded.setdefault(int(event["d"]["channel_id"]), deque()).append(int(event["d"]["id"]))
+    return recorded
+
+
+def percentile_line(metrics, name: str) -> str:
+    histograms = [histogram for (metric, _), histogram in metrics.histograms.items() if metric == name]
+    count = sum(histogram.count for histogram in histograms)
+    if not count:
+        return "aucune mesure"
+    merged = main.Histogram()
+    for histogram in histograms:
+        merged.counts = [a + b for a, b in zip(merged.counts, histogram.counts)]
+        merged.count += histogram.count
+        merged.total += histogram.total
+    return f"p50 ≤ {merged.quantile(0.5):g} s • p99 ≤ {merged.quantile(0.99):g} s • n={count}"
+
+
+async def replay(args, out):
+    events = load_events(args.file)
+    if not events:
+        out("Aucun évènement dans l'enregistrement")
+        return
+
+    ready = next((event["d"] for event in events if event["t"] == "READY"), None)
+    bot_user = ready["user"] if ready else {"id": "1", "username": "giveaway", "discriminator": "0", "avatar": None, "bot": True}
+    application_id = int(ready["application"]["id"]) if ready else int(bot_user["id"])
+
+    loop = asyncio.get_running_loop()
+    origin_wall, origin_loop = events[0]["time"], loop.time()
+    main.clock.use(lambda: origin_wall + (loop.time() - origin_loop), loop.time)
+
+    api = ReplayAPI(bot_user, application_id, recorded_bot_messages(events, int(bot_user["id"])), args.latency)
+    bot = main.bot
+    bot.http.request = api.request
+    async_context.set(ReplayWebhookAdapter(api))
+    # Pas de passerelle : les serveurs ne sont connus que par leurs GUILD_CREATE enregistrés
+    bot._connection._chunk_guilds = False
+
+    real_start = time.perf_counter()
+    await bot.login("replay")
+    parsers = bot._connection.parsers
+
+    replayed = Counter()
+    errors = Counter()
+    unknown_buttons = 0
+    is_ready = ready is None
+    if is_ready:
+        bot._ready.set()
+
+    for event in events:
+        delay = event["time"] - main.clock.time()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+        name, data = event["t"], event["d"]
+        if not is_ready and name not in ("READY", "GUILD_CREATE"):
+            # Fin de la séquence de connexion enregistrée
+            is_ready = True
+            bot._ready.set()
+            bot.dispatch("ready")
+        if name in ("READY", "RESUMED"):
+            continue
+
+        if name == "INTERACTION_CREATE" and data.get("type") == 3:
+            message_id = int(data["message"]["id"])
+            if message_id in api.custom_ids:
+                data["data"]["custom_id"] = api.custom_ids[message_id]
+            elif message_id not in bot.active_giveaways:
+                unknown_buttons += 1
+
+        parser = parsers.get(name)
+        if parser is None:
+            continue
+        try:
+            parser(data)
+            replayed[name] += 1
+        except Exception as e:
+            errors[f"{name}: {type(e).__name__}"] += 1
+        # Laisse les tâches déclenchées par l'évènement démarrer avant le suivant
+        await asyncio.sleep(0)
+
+    if not is_ready:
+        bot._ready.set()
+        bot.dispatch("ready")
+
+    # Les giveaways encore en cours se terminent sur l'horloge virtuelle
+    last_event = main.clock.time()
+    while bot.active_giveaways and main.clock.time() - last_event < args.tail * 3600:
+        await asyncio.sleep(60)
+    remaining = len(bot.active_giveaways)
+    virtual_duration = main.clock.time() - origin_wall
+    await bot.close()
+    real_duration = time.perf_counter() - real_start
+
+    out(f"== rejeu : {args.file}")
+    out(f"  évènements           : {sum(replayed.values())} rejoués sur {len(events)} enregistrés")
+    for name, count in replayed.most_common():
+        out(f"    {name:<40} {count:>7}")
+    if errors:
+        out("  erreurs :")
+        for name, count in errors.most_common():
+            out(f"    {name:<40} {count:>7}")
+    if unknown_buttons:
+        out(f"  clics sans giveaway  : {unknown_buttons} (giveaway lancé avant l'enregistrement : voir --db)")
+    out(f"  temps virtuel        : {virtual_duration / 3600:.2f} h en {real_duration:.2f} s réelles")
+    out(f"  giveaways non finis  : {remaining}")
+    out(f"  retard de fin        : {percentile_line(bot.metrics, 'end_giveaway_lateness_seconds')}")
+    out(f"  accusé interactions  : {percentile_line(bot.metrics, 'interaction_ack_seconds')}")
+    out("  requêtes HTTP :")
+    for route, count in sorted(api.requests.items()):
+        out(f"    {route:<60} {count:>7}")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Rejeu d'évènements gateway enregistrés sur une horloge virtuelle")
+    parser.add_argument("file", help="fichier produit avec RECORD_FILE")
+    parser.add_argument("--db", help="copie de la base de production au début de l'enregistrement")
+    parser.add_argument("--latency", type=float, default=0.0, help="latence virtuelle d'une requête REST (s)")
+    parser.add_argument("--tail", type=float, default=48.0, help="heures virtuelles laissées aux giveaways en cours")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="écrit aussi le rapport dans ce fichier")
+    return parser.parse_args(argv)
+
+
+def run(args):
+    lines = []
+
+    def out(line=""):
+        print(line)
+        lines.append(line)
+
+    with asyncio.Runner(loop_factory=VirtualClockLoop) as runner:
+        runner.run(replay(args, out))
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            file.write("\n".join(lines) + "\n")
+
+
+if __name__ == "__main__":
+    arguments = parse_args()
+    if arguments.db:
+        shutil.copyfile(arguments.db, os.environ['DB_PATH'])
+    random.seed(arguments.seed)
+
+    # Import après la copie de la base : le bot ouvre DB_PATH dès sa création
+    import main
+
+    run(arguments)
+    shutil.rmtree(_workdir, ignore_errors=True)
+    sys.exit(0)